@@ -3,38 +3,139 @@ Módulo de autenticação para a Microsoft Graph API.
 Gerencia tokens de acesso e autenticação OAuth para acessar o SharePoint.
 """
 
+import base64
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
 import time
 import streamlit as st
 from typing import Dict, Optional, Any, Tuple
 
-@st.cache_resource(ttl=3500)  # Quase 1 hora, pois tokens geralmente expiram em 1h
-def get_graph_token() -> Optional[str]:
+# Antecedência (em segundos) com que o token passa a ser renovado em segundo plano
+MARGEM_RENOVACAO_SEGUNDOS = 300
+
+# Validade mínima (em segundos) para um token ser considerado válido
+MARGEM_VALIDADE_SEGUNDOS = 60
+
+# Sessão HTTP reutilizada entre as chamadas (mantém a conexão aberta)
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2)
+))
+
+class _TokenCache:
+    """Guarda o token atual e sua expiração, compartilhados entre as sessões."""
+    
+    def __init__(self):
+        self.token: Optional[str] = None
+        self.expiracao: float = 0.0
+        self.lock = threading.Lock()
+        self.renovando = threading.Event()
+
+_TOKEN_CACHE = _TokenCache()
+
+def _solicitar_token() -> requests.Response:
+    """
+    Solicita um novo token à Microsoft usando o client credentials flow.
+    
+    Returns:
+        Resposta HTTP do endpoint de token
+        
+    Raises:
+        KeyError: Se as credenciais não estiverem em st.secrets
+        requests.exceptions.RequestException: Em caso de falha de rede
+    """
+    tenant_id = st.secrets["TENANT_ID"]
+    client_id = st.secrets["CLIENT_ID"]
+    client_secret = st.secrets["CLIENT_SECRET"]
+    
+    url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    data = {
+        "client_id": client_id,
+        "scope": "https://graph.microsoft.com/.default",
+        "client_secret": client_secret,
+        "grant_type": "client_credentials"
+    }
+
+    return _SESSION.post(url, headers=headers, data=data, timeout=30)
+
+def _armazenar_token(response: requests.Response) -> Optional[str]:
+    """
+    Guarda no cache o token de uma resposta bem-sucedida.
+    
+    Args:
+        response: Resposta HTTP 200 do endpoint de token
+        
+    Returns:
+        Token de acesso recebido
+    """
+    dados = response.json()
+    token = dados.get("access_token")
+    expira_em = float(dados.get("expires_in", 3600))
+    
+    with _TOKEN_CACHE.lock:
+        _TOKEN_CACHE.token = token
+        _TOKEN_CACHE.expiracao = time.time() + expira_em
+    
+    return token
+
+def _renovar_em_segundo_plano() -> None:
+    """Renova o token sem bloquear quem está usando o token atual."""
+    try:
+        response = _solicitar_token()
+        if response.status_code == 200:
+            _armazenar_token(response)
+    except Exception:
+        pass  # O token atual ainda vale; a próxima chamada tenta novamente
+    finally:
+        _TOKEN_CACHE.renovando.clear()
+
+def get_graph_token(forcar_renovacao: bool = False) -> Optional[str]:
     """
     Obtém um token de autenticação para a Microsoft Graph API usando
     credenciais de aplicativo (client credentials flow).
     
+    O token fica em cache até expirar. Nos últimos minutos de validade,
+    o token atual continua sendo devolvido enquanto um novo é solicitado
+    em segundo plano; só há espera pela rede quando o token já expirou.
+    
+    Args:
+        forcar_renovacao: Se deve ignorar o cache e solicitar um novo token
+    
     Returns:
         Token de autenticação ou None em caso de erro
     """
-    try:
-        tenant_id = st.secrets["TENANT_ID"]
-        client_id = st.secrets["CLIENT_ID"]
-        client_secret = st.secrets["CLIENT_SECRET"]
+    agora = time.time()
+    iniciar_renovacao = False
+    
+    with _TOKEN_CACHE.lock:
+        token = _TOKEN_CACHE.token
+        token_valido = bool(token) and not forcar_renovacao and agora < _TOKEN_CACHE.expiracao
         
-        url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
-
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        data = {
-            "client_id": client_id,
-            "scope": "https://graph.microsoft.com/.default",
-            "client_secret": client_secret,
-            "grant_type": "client_credentials"
-        }
-
-        response = requests.post(url, headers=headers, data=data, timeout=30)
+        # Token perto de expirar: renova em segundo plano, uma única vez
+        if (
+            token_valido
+            and agora >= _TOKEN_CACHE.expiracao - MARGEM_RENOVACAO_SEGUNDOS
+            and not _TOKEN_CACHE.renovando.is_set()
+        ):
+            _TOKEN_CACHE.renovando.set()
+            iniciar_renovacao = True
+    
+    if token_valido:
+        if iniciar_renovacao:
+            threading.Thread(target=_renovar_em_segundo_plano, daemon=True).start()
+        return token
+    
+    try:
+        response = _solicitar_token()
         if response.status_code == 200:
-            return response.json().get("access_token")
+            return _armazenar_token(response)
         else:
             st.error(f"Erro ao gerar token de acesso: {response.status_code}")
             if st.checkbox("Mostrar detalhes do erro", value=False):
@@ -52,7 +153,10 @@ def get_graph_token() -> Optional[str]:
 
 def verificar_token_valido(token: str) -> bool:
     """
-    Verifica se um token ainda é válido fazendo uma chamada de teste à API.
+    Verifica se um token ainda é válido.
+    
+    Para tokens JWT, a expiração (claim `exp`) é verificada localmente.
+    Só tokens opacos são verificados com uma chamada de teste à API.
     
     Args:
         token: Token de autenticação a ser verificado
@@ -62,12 +166,16 @@ def verificar_token_valido(token: str) -> bool:
     """
     if not token:
         return False
+    
+    info = get_token_info(token)
+    if info.get("expires"):
+        return info["expires"] - time.time() > MARGEM_VALIDADE_SEGUNDOS
         
     headers = {"Authorization": f"Bearer {token}"}
     url = "https://graph.microsoft.com/v1.0/me"  # Endpoint simples para verificação
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _SESSION.get(url, headers=headers, timeout=3)
         return response.status_code not in (401, 403)  # 401/403 indicam token inválido
     except Exception:
         return False
@@ -93,15 +201,12 @@ def get_token_info(token: str) -> Dict[str, Any]:
             return {}
             
         # Decodifica a parte do payload (índice 1)
-        import base64
-        import json
-        
         # Ajusta o padding se necessário
         payload = parts[1]
         payload += '=' * ((4 - len(payload) % 4) % 4)
         
-        # Decodifica o payload
-        decoded = base64.b64decode(payload)
+        # Decodifica o payload (JWT usa base64 com alfabeto seguro para URL)
+        decoded = base64.urlsafe_b64decode(payload)
         info = json.loads(decoded)
         
         # Extrai informações relevantes
@@ -143,7 +248,7 @@ def renovar_token_se_necessario(token: str) -> Optional[str]:
     # Se o token expirar em menos de 5 minutos, renova
     if info.get("expires_in_minutes", 0) < 5:
         st.info("Token de acesso prestes a expirar. Renovando...")
-        novo_token = get_graph_token()
+        novo_token = get_graph_token(forcar_renovacao=True)
         if novo_token:
             st.success("Token renovado com sucesso.")
             return novo_token
@@ -5,22 +5,134 @@ Permite criar representações vetoriais de textos para consultas semânticas.
 
 import os
 import json
+import hashlib
+import asyncio
+import functools
+from collections import OrderedDict
 import numpy as np
 import streamlit as st
-from typing import List, Dict, Any, Union, Optional
-from openai import OpenAI
+from typing import List, Dict, Any, Union, Optional, Set, Tuple
+from openai import OpenAI, AsyncOpenAI
 
-# Dimensões do modelo de embeddings da OpenAI
-EMBEDDING_DIMENSIONS = 1536  # para o modelo text-embedding-ada-002
+# Tokenizador da OpenAI, usado para respeitar os limites de tokens da API
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Serialização JSON mais rápida para o cache em arquivos (opcional)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Armazenamento compacto do cache em um único banco LMDB (opcional)
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+# Modelo de embeddings padrão e dimensões pedidas à API (os modelos
+# text-embedding-3 aceitam vetores truncados com o parâmetro `dimensions`)
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512
+
+# Modelo usado pelas versões anteriores (cache gravado sem o nome do modelo)
+MODELO_LEGADO = "text-embedding-ada-002"
+DIMENSOES_MODELO_LEGADO = 1536
+
+# Embedding de textos vazios, compartilhado (somente leitura)
+_ZERO_EMBEDDING = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+_ZERO_EMBEDDING.flags.writeable = False
+
+# Limites da API de embeddings: tokens de cada texto (textos maiores são
+# truncados) e textos e tokens somados de cada requisição
+MAX_TOKENS_POR_TEXTO = 8191
+MAX_TEXTOS_POR_REQUISICAO = 16
+MAX_TOKENS_POR_REQUISICAO = 300000
+
+# Número máximo de lotes enviados simultaneamente à API
+MAX_REQUISICOES_SIMULTANEAS = 16
+
+# Número de embeddings mantidos em memória pelo cache LRU de cada gerenciador
+TAMANHO_CACHE_MEMORIA = 4096
+
+# Número de vetores normalizados reaproveitados entre chamadas de similarity()
+TAMANHO_CACHE_UNITARIOS = 8
+
+# Tamanho máximo do banco LMDB do cache (o arquivo cresce sob demanda)
+LMDB_MAP_SIZE = 2**32
+
+# Ambientes LMDB abertos, por caminho (o LMDB não permite abrir o mesmo
+# banco duas vezes no mesmo processo)
+_AMBIENTES_LMDB: Dict[str, Any] = {}
+
+def _abrir_lmdb(caminho: str):
+    """
+    Abre (ou reaproveita) o banco LMDB do cache de embeddings.
+    
+    Args:
+        caminho: Caminho do diretório do banco
+        
+    Returns:
+        Ambiente LMDB ou None se o lmdb não estiver disponível
+    """
+    if lmdb is None:
+        return None
+    
+    caminho = os.path.abspath(caminho)
+    env = _AMBIENTES_LMDB.get(caminho)
+    if env is None:
+        try:
+            env = lmdb.open(caminho, map_size=LMDB_MAP_SIZE)
+        except lmdb.Error:
+            return None
+        _AMBIENTES_LMDB[caminho] = env
+    return env
+
+@functools.lru_cache(maxsize=None)
+def _obter_codificacao(modelo: str):
+    """
+    Retorna a codificação do tiktoken de um modelo, carregada uma única vez.
+    
+    Args:
+        modelo: Modelo de embeddings da OpenAI
+        
+    Returns:
+        Codificação do tiktoken ou None se o tiktoken não estiver disponível
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(modelo)
+    except Exception:
+        return None
+
+def _quantizar_int8(vetores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantiza vetores float para int8 com uma escala por vetor.
+    
+    Args:
+        vetores: Vetor (dim,) ou matriz (N, dim) em float
+        
+    Returns:
+        Tupla (valores int8, escalas float32) tal que valores * escala ≈ vetores
+    """
+    maximos = np.abs(vetores).max(axis=-1, keepdims=True)
+    escalas = np.where(maximos > 0, maximos / 127.0, 1.0).astype(np.float32)
+    quantizados = np.round(vetores / escalas).astype(np.int8)
+    return quantizados, escalas.squeeze(-1)
 
 class EmbeddingsManager:
     """Gerencia a criação, armazenamento e consulta de embeddings de texto."""
     
     def __init__(
         self, 
-        model: str = "text-embedding-ada-002",
+        model: str = EMBEDDING_MODEL,
         cache_dir: str = "embeddings_cache",
-        use_cache: bool = True
+        use_cache: bool = True,
+        quantizar_int8: bool = False,
+        dimensions: int = EMBEDDING_DIMENSIONS
     ):
         """
         Inicializa o gerenciador de embeddings.
@@ -29,15 +141,50 @@ class EmbeddingsManager:
             model: Modelo de embeddings da OpenAI a ser utilizado
             cache_dir: Diretório para armazenar cache de embeddings
             use_cache: Se deve usar cache para evitar chamadas repetidas à API
+            quantizar_int8: Se deve manter a matriz de candidatos em int8
+                (4x menos memória que float32, com pequena perda de precisão)
+            dimensions: Dimensões dos embeddings (só para modelos text-embedding-3;
+                o ada-002 sempre gera 1536)
         """
         self.model = model
         self.cache_dir = cache_dir
         self.use_cache = use_cache
+        self.quantizar_int8 = quantizar_int8
+        
+        # Só os modelos text-embedding-3 aceitam o parâmetro `dimensions`
+        if model.startswith("text-embedding-3"):
+            self.dimensions: Optional[int] = dimensions
+        else:
+            self.dimensions = None
+        
+        # Embedding de textos vazios, com as dimensões do modelo
+        if self.dimensions == EMBEDDING_DIMENSIONS:
+            self._zero_embedding = _ZERO_EMBEDDING
+        else:
+            self._zero_embedding = np.zeros(self.dimensions or DIMENSOES_MODELO_LEGADO, dtype=np.float32)
+            self._zero_embedding.flags.writeable = False
         
         # Cria o diretório de cache se não existir
         if use_cache and not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
         
+        # Banco LMDB do cache; sem o lmdb, usa um arquivo JSON por texto
+        self._db = _abrir_lmdb(os.path.join(cache_dir, "embeddings.lmdb")) if use_cache else None
+        
+        # Hashes SHA-256 dos arquivos do cache antigo ainda não migrados
+        self._cache_legado: Set[str] = set()
+        if self._db is not None:
+            self._importar_cache_json()
+        
+        # Cache LRU em memória (hash do texto -> embedding somente leitura)
+        self._memoria: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        
+        # Matriz normalizada dos últimos candidatos consultados
+        self._cand_cache: Optional[tuple] = None
+        
+        # Vetores normalizados usados recentemente (id -> (vetor, unitário))
+        self._unit_cache: "OrderedDict[int, tuple]" = OrderedDict()
+        
         # Inicializa o cliente da OpenAI
         try:
             self.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
@@ -45,7 +192,7 @@ class EmbeddingsManager:
             st.warning("API Key da OpenAI não configurada. Embeddings não estarão disponíveis.")
             self.client = None
     
-    def create_embedding(self, text: str) -> Optional[List[float]]:
+    def create_embedding(self, text: str) -> Optional[np.ndarray]:
         """
         Cria um embedding para um texto usando a API da OpenAI.
         
@@ -53,37 +200,30 @@ class EmbeddingsManager:
             text: Texto para gerar o embedding
             
         Returns:
-            Lista de floats representando o embedding ou None em caso de erro
+            Vetor float32 representando o embedding ou None em caso de erro
         """
         if not self.client:
             return None
             
         if not text or text.isspace():
-            return np.zeros(EMBEDDING_DIMENSIONS).tolist()
+            return self._zero_embedding
             
         # Verifica cache
-        if self.use_cache:
-            cache_file = self._get_cache_filename(text)
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, 'r') as f:
-                        return json.load(f)
-                except:
-                    pass  # Se falhar, continua para gerar novo embedding
+        cached = self._ler_cache(text)
+        if cached is not None:
+            return cached
         
         # Gera embedding via API
         try:
             response = self.client.embeddings.create(
                 model=self.model,
-                input=text
+                input=self._preparar_entrada(text)[0],
+                **self._parametros_api()
             )
-            embedding = response.data[0].embedding
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
             
             # Salva no cache
-            if self.use_cache:
-                cache_file = self._get_cache_filename(text)
-                with open(cache_file, 'w') as f:
-                    json.dump(embedding, f)
+            self._gravar_cache(text, embedding)
                     
             return embedding
             
@@ -91,19 +231,421 @@ class EmbeddingsManager:
             st.error(f"Erro ao gerar embedding: {str(e)}")
             return None
     
-    def create_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+    def create_embeddings_batch(self, texts: List[str]) -> List[Optional[np.ndarray]]:
         """
         Cria embeddings para uma lista de textos.
         
+        Os textos que não estão em cache (truncados em MAX_TOKENS_POR_TEXTO
+        tokens) são enviados em lotes de até MAX_TEXTOS_POR_REQUISICAO textos
+        e MAX_TOKENS_POR_REQUISICAO tokens,
+        uma única requisição por lote, com os lotes enviados em paralelo
+        (até MAX_REQUISICOES_SIMULTANEAS ao mesmo tempo). Os novos embeddings
+        são gravados no cache em uma única transação.
+        
         Args:
             texts: Lista de textos para gerar embeddings
             
         Returns:
             Lista de embeddings para cada texto
         """
-        return [self.create_embedding(text) for text in texts]
+        if not self.client:
+            return [None] * len(texts)
+        
+        embeddings, lotes, entradas = self._separar_pendentes(texts)
+        respostas = self._enviar_lotes(entradas)
+        self._aplicar_respostas(texts, lotes, respostas, embeddings)
+        return embeddings
+    
+    async def acreate_embeddings_batch(
+        self,
+        texts: List[str],
+        client: AsyncOpenAI,
+        semaforo: asyncio.Semaphore
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Versão assíncrona de create_embeddings_batch, para uso dentro de um event loop.
+        
+        Args:
+            texts: Lista de textos para gerar embeddings
+            client: Cliente assíncrono da OpenAI (ver criar_cliente_async)
+            semaforo: Semáforo que limita as requisições simultâneas
+            
+        Returns:
+            Lista de embeddings para cada texto
+        """
+        if not self.client:
+            return [None] * len(texts)
+        
+        embeddings, lotes, entradas = self._separar_pendentes(texts)
+        respostas = await asyncio.gather(
+            *(self._aenviar_lote(client, semaforo, entrada) for entrada in entradas),
+            return_exceptions=True
+        )
+        self._aplicar_respostas(texts, lotes, respostas, embeddings)
+        return embeddings
+    
+    def criar_cliente_async(self) -> AsyncOpenAI:
+        """
+        Cria um cliente assíncrono da OpenAI com a mesma chave do cliente síncrono.
+        
+        O cliente fica preso ao event loop em que é usado; crie um novo a
+        cada `asyncio.run` e feche-o com `await client.close()`.
+        
+        Returns:
+            Cliente AsyncOpenAI
+        """
+        return AsyncOpenAI(api_key=self.client.api_key)
+    
+    def _separar_pendentes(
+        self, 
+        texts: List[str]
+    ) -> Tuple[List[Optional[np.ndarray]], List[List[int]], List[List[str]]]:
+        """
+        Resolve textos vazios e acertos de cache e agrupa o restante em lotes.
+        
+        Args:
+            texts: Lista de textos para gerar embeddings
+            
+        Returns:
+            Tupla (embeddings já conhecidos, lotes de índices que precisam da
+            API, textos a enviar em cada lote, já truncados)
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        pendentes = []
+        
+        # Separa textos vazios e acertos de cache dos que precisam da API
+        for i, text in enumerate(texts):
+            if not text or text.isspace():
+                embeddings[i] = self._zero_embedding
+                continue
+            
+            cached = self._ler_cache(text)
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                pendentes.append(i)
+        
+        preparados = [self._preparar_entrada(texts[i]) for i in pendentes]
+        lotes = []
+        entradas = []
+        for lote in self._agrupar_em_lotes([tokens for _, tokens in preparados]):
+            lotes.append([pendentes[j] for j in lote])
+            entradas.append([preparados[j][0] for j in lote])
+        return embeddings, lotes, entradas
+    
+    def _aplicar_respostas(
+        self,
+        texts: List[str],
+        lotes: List[List[int]],
+        respostas: List[Any],
+        embeddings: List[Optional[np.ndarray]]
+    ) -> None:
+        """
+        Preenche os embeddings com as respostas da API e grava os novos no cache.
+        
+        Args:
+            texts: Lista de textos de origem
+            lotes: Lotes de índices enviados à API
+            respostas: Resposta da API (ou exceção) de cada lote
+            embeddings: Lista de embeddings a preencher
+        """
+        novos = []
+        for indices, response in zip(lotes, respostas):
+            if isinstance(response, Exception):
+                st.error(f"Erro ao gerar embeddings em lote: {str(response)}")
+                continue
+            
+            # A API informa o índice de cada item dentro do lote
+            for item in response.data:
+                i = indices[item.index]
+                embeddings[i] = np.asarray(item.embedding, dtype=np.float32)
+                novos.append((texts[i], embeddings[i]))
+        
+        self._gravar_cache_lote(novos)
+    
+    def _enviar_lotes(self, entradas: List[List[str]]) -> List[Any]:
+        """
+        Envia os lotes de textos à API de embeddings.
+        
+        Com mais de um lote, as requisições são feitas em paralelo com o
+        cliente assíncrono. Se já houver um event loop em execução na
+        thread atual, os lotes são enviados em sequência.
+        
+        Args:
+            entradas: Lista de lotes, cada um com os textos a enviar
+            
+        Returns:
+            Lista com a resposta da API (ou a exceção levantada) de cada lote
+        """
+        if len(entradas) > 1:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self._aenviar_lotes(entradas))
+        
+        respostas = []
+        for entrada in entradas:
+            try:
+                respostas.append(self.client.embeddings.create(
+                    model=self.model, input=entrada, **self._parametros_api()
+                ))
+            except Exception as e:
+                respostas.append(e)
+        return respostas
+    
+    async def _aenviar_lotes(self, entradas: List[List[str]]) -> List[Any]:
+        """
+        Envia os lotes de textos em paralelo com o cliente assíncrono da OpenAI.
+        
+        O cliente é criado a cada chamada porque fica preso ao event loop
+        criado por `asyncio.run`.
+        
+        Args:
+            entradas: Lista de lotes, cada um com os textos a enviar
+            
+        Returns:
+            Lista com a resposta da API (ou a exceção levantada) de cada lote
+        """
+        semaforo = asyncio.Semaphore(MAX_REQUISICOES_SIMULTANEAS)
+        client = self.criar_cliente_async()
+        
+        try:
+            return await asyncio.gather(
+                *(self._aenviar_lote(client, semaforo, entrada) for entrada in entradas),
+                return_exceptions=True
+            )
+        finally:
+            await client.close()
     
-    def similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+    async def _aenviar_lote(
+        self, 
+        client: AsyncOpenAI, 
+        semaforo: asyncio.Semaphore, 
+        entrada: List[str]
+    ) -> Any:
+        """
+        Envia um lote de textos à API, respeitando o limite de requisições simultâneas.
+        
+        Args:
+            client: Cliente assíncrono da OpenAI
+            semaforo: Semáforo que limita as requisições simultâneas
+            entrada: Textos do lote
+            
+        Returns:
+            Resposta da API
+        """
+        async with semaforo:
+            return await client.embeddings.create(
+                model=self.model, input=entrada, **self._parametros_api()
+            )
+    
+    def _parametros_api(self) -> Dict[str, Any]:
+        """
+        Parâmetros adicionais das requisições à API de embeddings.
+        
+        Returns:
+            Dicionário com `dimensions`, para os modelos que o aceitam
+        """
+        return {"dimensions": self.dimensions} if self.dimensions else {}
+    
+    def _agrupar_em_lotes(self, contagens: List[int]) -> List[List[int]]:
+        """
+        Agrupa os textos em lotes que respeitam os limites da API.
+        
+        Args:
+            contagens: Número de tokens de cada texto a agrupar
+            
+        Returns:
+            Lista de lotes, cada um com os índices dos textos em `contagens`
+        """
+        lotes = []
+        lote_atual = []
+        tokens_lote = 0
+        
+        for i, tokens in enumerate(contagens):
+            if lote_atual and (
+                len(lote_atual) >= MAX_TEXTOS_POR_REQUISICAO
+                or tokens_lote + tokens > MAX_TOKENS_POR_REQUISICAO
+            ):
+                lotes.append(lote_atual)
+                lote_atual = []
+                tokens_lote = 0
+            
+            lote_atual.append(i)
+            tokens_lote += tokens
+        
+        if lote_atual:
+            lotes.append(lote_atual)
+        
+        return lotes
+    
+    def _preparar_entrada(self, text: str) -> Tuple[str, int]:
+        """
+        Trunca um texto em MAX_TOKENS_POR_TEXTO tokens, o limite da API por texto.
+        
+        Args:
+            text: Texto a ser enviado
+            
+        Returns:
+            Tupla (texto, possivelmente truncado, e o seu número de tokens,
+            estimado se o tiktoken não estiver disponível)
+        """
+        codificacao = _obter_codificacao(self.model)
+        if codificacao is not None:
+            tokens = codificacao.encode(text)
+            if len(tokens) > MAX_TOKENS_POR_TEXTO:
+                return codificacao.decode(tokens[:MAX_TOKENS_POR_TEXTO]), MAX_TOKENS_POR_TEXTO
+            return text, len(tokens)
+        
+        # Sem o tiktoken: trunca com folga (2 caracteres por token) e estima
+        # a contagem com cerca de 3 caracteres por token
+        text = text[:MAX_TOKENS_POR_TEXTO * 2]
+        return text, len(text) // 3 + 1
+    
+    def _ler_cache(self, text: str) -> Optional[np.ndarray]:
+        """
+        Lê o embedding de um texto do cache, primeiro em memória e depois em disco.
+        
+        Args:
+            text: Texto cujo embedding será buscado
+            
+        Returns:
+            Embedding em cache (float32, somente leitura) ou None se não encontrado
+        """
+        if not self.use_cache:
+            return None
+        
+        chave = self._chave_cache(text)
+        embedding = self._memoria.get(chave)
+        if embedding is not None:
+            self._memoria.move_to_end(chave)
+            return embedding
+        
+        embedding = self._ler_cache_disco(text, chave)
+        if embedding is not None:
+            embedding = self._memorizar(chave, embedding)
+        return embedding
+    
+    def _memorizar(self, chave: str, embedding: np.ndarray) -> np.ndarray:
+        """
+        Guarda um embedding no cache LRU em memória.
+        
+        Args:
+            chave: Hash do texto de origem
+            embedding: Embedding a ser guardado
+            
+        Returns:
+            O embedding guardado, como array float32 somente leitura
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.flags.writeable = False
+        self._memoria[chave] = embedding
+        self._memoria.move_to_end(chave)
+        if len(self._memoria) > TAMANHO_CACHE_MEMORIA:
+            self._memoria.popitem(last=False)
+        return embedding
+    
+    def _ler_cache_disco(self, text: str, chave: str) -> Optional[np.ndarray]:
+        """
+        Lê o embedding de um texto do cache em disco.
+        
+        Com o LMDB, o embedding é lido do banco (float16); os arquivos JSON
+        já foram importados ao abrir o banco, então o disco só é consultado
+        quando o texto está na lista de arquivos do cache SHA-256 antigo.
+        
+        Args:
+            text: Texto cujo embedding será buscado
+            chave: Hash do texto, já calculado
+            
+        Returns:
+            Embedding em cache (float32) ou None se não encontrado
+        """
+        if self._db is not None:
+            try:
+                with self._db.begin() as txn:
+                    valor = txn.get(chave.encode('ascii'))
+                if valor is not None:
+                    return np.frombuffer(valor, dtype=np.float16).astype(np.float32)
+            except lmdb.Error:
+                pass
+            
+            if not self._cache_legado:
+                return None
+            legacy_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            if legacy_hash not in self._cache_legado:
+                return None
+            self._cache_legado.discard(legacy_hash)
+        
+        cache_file = self._get_cache_filename(text)
+        if not os.path.exists(cache_file):
+            self._migrar_cache_legado(text, cache_file)
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    dados = orjson.loads(f.read()) if orjson is not None else json.load(f)
+                embedding = np.asarray(dados, dtype=np.float32)
+            except:
+                return None  # Se falhar, o embedding será gerado novamente
+            
+            # Traz o embedding do cache antigo para o LMDB
+            if self._db is not None:
+                self._gravar_cache(text, embedding)
+            return embedding
+        return None
+    
+    def _gravar_cache(self, text: str, embedding: np.ndarray) -> None:
+        """
+        Grava o embedding de um texto no cache em disco.
+        
+        Args:
+            text: Texto de origem do embedding
+            embedding: Embedding a ser armazenado
+        """
+        self._gravar_cache_lote([(text, embedding)])
+    
+    def _gravar_cache_lote(self, pares: List[Tuple[str, np.ndarray]]) -> None:
+        """
+        Grava vários embeddings no cache em memória e em disco.
+        
+        Com o LMDB, todos são gravados em uma única transação, como float16.
+        
+        Args:
+            pares: Lista de tuplas (texto, embedding)
+        """
+        if not self.use_cache or not pares:
+            return
+        
+        for text, embedding in pares:
+            self._memorizar(self._chave_cache(text), embedding)
+        
+        if self._db is not None:
+            try:
+                with self._db.begin(write=True) as txn:
+                    for text, embedding in pares:
+                        txn.put(
+                            self._chave_cache(text).encode('ascii'),
+                            np.asarray(embedding, dtype=np.float16).tobytes()
+                        )
+                return
+            except lmdb.Error:
+                pass  # Banco cheio ou indisponível: usa os arquivos JSON
+        
+        for text, embedding in pares:
+            cache_file = self._get_cache_filename(text)
+            try:
+                if orjson is not None:
+                    conteudo = orjson.dumps(
+                        np.asarray(embedding, dtype=np.float32),
+                        option=orjson.OPT_SERIALIZE_NUMPY
+                    )
+                else:
+                    conteudo = json.dumps(np.asarray(embedding).tolist()).encode('utf-8')
+                with open(cache_file, 'wb') as f:
+                    f.write(conteudo)
+            except OSError:
+                pass  # Falha no cache não impede o uso do embedding
+    
+    def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Calcula a similaridade de cosseno entre dois embeddings.
         
@@ -114,25 +656,59 @@ class EmbeddingsManager:
         Returns:
             Valor de similaridade de cosseno (entre 0 e 1)
         """
-        if not embedding1 or not embedding2:
+        if embedding1 is None or embedding2 is None or len(embedding1) == 0 or len(embedding2) == 0:
             return 0.0
-            
-        # Converte para arrays numpy
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
-        
-        # Normaliza os vetores
-        vec1_norm = np.linalg.norm(vec1)
-        vec2_norm = np.linalg.norm(vec2)
         
-        if vec1_norm == 0 or vec2_norm == 0:
+        # Vetores já normalizados (reaproveitados se usados recentemente)
+        vec1 = self._as_unit(embedding1)
+        vec2 = self._as_unit(embedding2)
+        if vec1 is None or vec2 is None:
             return 0.0
-            
-        # Calcula similaridade de cosseno
-        cosine_similarity = np.dot(vec1, vec2) / (vec1_norm * vec2_norm)
         
         # Garante que o valor esteja entre 0 e 1
-        return float(max(0.0, min(1.0, cosine_similarity)))
+        return float(max(0.0, min(1.0, np.dot(vec1, vec2))))
+    
+    def _as_unit(self, embedding: Union[List[float], np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding normalizado (norma 1) em float32.
+        
+        Os últimos TAMANHO_CACHE_UNITARIOS vetores somente leitura que são
+        donos dos seus dados (como os embeddings do cache do gerenciador)
+        são lembrados pela identidade do objeto, de modo que a mesma
+        consulta comparada com vários candidatos é normalizada uma única
+        vez. Listas e arrays graváveis podem ser alterados pelo chamador e
+        são sempre normalizados de novo.
+        
+        Args:
+            embedding: Embedding a normalizar
+            
+        Returns:
+            Vetor unitário ou None se o embedding tiver norma zero
+        """
+        imutavel = (
+            isinstance(embedding, np.ndarray)
+            and not embedding.flags.writeable
+            and embedding.flags.owndata
+        )
+        chave = id(embedding)
+        if imutavel:
+            cache = self._unit_cache.get(chave)
+            if cache is not None and cache[0] is embedding:
+                self._unit_cache.move_to_end(chave)
+                return cache[1]
+        
+        vetor = np.asarray(embedding, dtype=np.float32)
+        norma = np.linalg.norm(vetor)
+        unitario = vetor / norma if norma > 0 else None
+        if unitario is not None:
+            unitario.flags.writeable = False
+        
+        # Guarda a referência ao embedding para que o id não seja reutilizado
+        if imutavel:
+            self._unit_cache[chave] = (embedding, unitario)
+            if len(self._unit_cache) > TAMANHO_CACHE_UNITARIOS:
+                self._unit_cache.popitem(last=False)
+        return unitario
     
     def find_most_similar(
         self, 
@@ -153,21 +729,43 @@ class EmbeddingsManager:
         Returns:
             Lista de índices ou dicionários com textos mais similares
         """
-        if not query_embedding or not candidate_embeddings:
+        if query_embedding is None or len(query_embedding) == 0 or not len(candidate_embeddings):
             return []
-            
-        # Calcula similaridades
-        similarities = [
-            self.similarity(query_embedding, candidate) 
-            for candidate in candidate_embeddings
-            if candidate is not None
-        ]
         
-        # Encontra os índices dos top_k mais similares
-        if not similarities:
+        # Matriz (N, dim) com os candidatos já normalizados
+        cand_matrix, cand_scales = self._matriz_candidatos(candidate_embeddings)
+        if cand_matrix.shape[1] == 0:
             return []
-            
-        top_indices = np.argsort(similarities)[::-1][:top_k].tolist()
+        
+        # Normaliza a consulta uma única vez
+        query = self._as_unit(query_embedding)
+        if query is None:
+            similarities = np.zeros(len(cand_matrix), dtype=np.float32)
+        elif cand_scales is not None:
+            # Produto em int8 com acumulação em int32, reescalado por linha
+            query_q, query_scale = _quantizar_int8(query)
+            similarities = np.einsum(
+                "ij,j->i", cand_matrix, query_q, dtype=np.int32, casting="unsafe"
+            ).astype(np.float32)
+            similarities *= cand_scales * query_scale
+        else:
+            # Similaridade de cosseno de todos os candidatos em um único produto
+            similarities = cand_matrix @ query
+        
+        # Garante que os valores estejam entre 0 e 1
+        np.clip(similarities, 0.0, 1.0, out=similarities)
+        
+        # Seleciona os top_k sem ordenar todos os candidatos
+        top_k = min(top_k, len(similarities))
+        if top_k <= 0:
+            return []
+        if top_k < len(similarities):
+            # Particiona o próprio array (sem negá-lo, o que criaria uma cópia de N itens)
+            corte = len(similarities) - top_k
+            top = np.argpartition(similarities, corte)[corte:]
+        else:
+            top = np.arange(len(similarities))
+        top_indices = top[np.argsort(-similarities[top])].tolist()
         
         # Se os textos foram fornecidos, retorna dicionários com texto e similaridade
         if texts:
@@ -175,13 +773,61 @@ class EmbeddingsManager:
                 {
                     "index": idx,
                     "text": texts[idx],
-                    "similarity": similarities[idx]
+                    "similarity": float(similarities[idx])
                 }
                 for idx in top_indices
             ]
         else:
             return top_indices
     
+    def _matriz_candidatos(
+        self, 
+        candidate_embeddings: List[List[float]]
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Monta a matriz de candidatos com as linhas normalizadas.
+        
+        A matriz da última lista consultada é reaproveitada enquanto a
+        lista tiver os mesmos elementos (os mesmos objetos, na mesma ordem),
+        evitando reconstruí-la a cada busca. Os elementos são guardados
+        junto da matriz, para que trocas feitas na própria lista sejam
+        percebidas.
+        Candidatos ausentes (None) viram linhas de zeros. Com
+        `quantizar_int8`, a matriz é guardada em int8 com uma escala por linha.
+        
+        Args:
+            candidate_embeddings: Lista de embeddings dos textos candidatos
+            
+        Returns:
+            Tupla (matriz (N, dim), escalas por linha ou None se float32)
+        """
+        cache = self._cand_cache
+        if (
+            cache is not None
+            and cache[2] == self.quantizar_int8
+            and len(cache[0]) == len(candidate_embeddings)
+            and all(a is b for a, b in zip(cache[0], candidate_embeddings))
+        ):
+            return cache[1]
+        
+        dim = next((len(c) for c in candidate_embeddings if c is not None), 0)
+        cand_matrix = np.zeros((len(candidate_embeddings), dim), dtype=np.float32)
+        for i, candidate in enumerate(candidate_embeddings):
+            if candidate is not None:
+                cand_matrix[i] = candidate
+        
+        norms = np.linalg.norm(cand_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        cand_matrix /= norms
+        
+        if self.quantizar_int8:
+            resultado = _quantizar_int8(cand_matrix)
+        else:
+            resultado = (cand_matrix, None)
+        
+        self._cand_cache = (tuple(candidate_embeddings), resultado, self.quantizar_int8)
+        return resultado
+    
     def search_by_text(
         self, 
         query: str, 
@@ -203,7 +849,7 @@ class EmbeddingsManager:
         """
         # Gera embedding da consulta
         query_embedding = self.create_embedding(query)
-        if not query_embedding:
+        if query_embedding is None:
             return []
             
         # Gera embeddings dos textos se não fornecidos
@@ -225,7 +871,88 @@ class EmbeddingsManager:
         Returns:
             Caminho para o arquivo de cache
         """
-        import hashlib
-        # Gera um hash do texto para usar como nome de arquivo
-        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
-        return os.path.join(self.cache_dir, f"{text_hash}.json")
+        return os.path.join(self.cache_dir, f"{self._chave_cache(text)}.json")
+    
+    def _chave_cache(self, text: str) -> str:
+        """
+        Gera a chave de cache de um texto.
+        
+        Usa BLAKE2b com 16 bytes (32 caracteres hexadecimais), mais rápido
+        que SHA-256 e suficiente para chaves de cache, prefixado com o modelo
+        e as dimensões para que embeddings de modelos diferentes não se misturem.
+        
+        Args:
+            text: Texto de origem do embedding
+            
+        Returns:
+            Chave no formato "<modelo>-<dimensões>_<hash>"
+        """
+        text_hash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        dimensoes = self.dimensions or DIMENSOES_MODELO_LEGADO
+        return f"{self.model}-{dimensoes}_{text_hash}"
+    
+    def _importar_cache_json(self) -> None:
+        """
+        Importa para o LMDB, de uma vez, os arquivos JSON do cache.
+        
+        Os arquivos gravados com a chave atual vão para o banco, em uma
+        única transação, e são removidos. Os do cache antigo (chave SHA-256
+        do texto, que só pode ser calculada a partir do texto) têm o nome
+        guardado em memória, para serem migrados quando o texto for buscado.
+        """
+        try:
+            entradas = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')]
+        except OSError:
+            return
+        
+        importados = []
+        try:
+            with self._db.begin(write=True) as txn:
+                for entrada in entradas:
+                    chave = entrada.name[:-len('.json')]
+                    if '_' not in chave:
+                        # Chave antiga: só há embeddings do ada-002
+                        if self.model == MODELO_LEGADO:
+                            self._cache_legado.add(chave)
+                        continue
+                    try:
+                        with open(entrada.path, 'rb') as f:
+                            dados = orjson.loads(f.read()) if orjson is not None else json.load(f)
+                        embedding = np.asarray(dados, dtype=np.float16)
+                        chave_bytes = chave.encode('ascii')
+                    except Exception:
+                        continue  # Arquivo corrompido: o embedding será gerado novamente
+                    txn.put(chave_bytes, embedding.tobytes())
+                    importados.append(entrada.path)
+        except lmdb.Error:
+            # Banco cheio ou indisponível: continua só com os arquivos JSON
+            self._db = None
+            return
+        
+        for caminho in importados:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+    
+    def _migrar_cache_legado(self, text: str, cache_file: str) -> None:
+        """
+        Renomeia, se existir, o arquivo de cache gravado com a chave SHA-256 antiga.
+        
+        O cache antigo só tem embeddings do ada-002, então a migração só
+        é feita para esse modelo.
+        
+        Args:
+            text: Texto de origem do embedding
+            cache_file: Caminho do arquivo de cache com a chave atual
+        """
+        if self.model != MODELO_LEGADO:
+            return
+        
+        legacy_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        legacy_file = os.path.join(self.cache_dir, f"{legacy_hash}.json")
+        if os.path.exists(legacy_file):
+            try:
+                os.replace(legacy_file, cache_file)
+            except OSError:
+                pass
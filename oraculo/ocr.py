@@ -4,21 +4,245 @@ Adaptado para tratar estrutura hierárquica de menus e botões do Guia Rápido d
 """
 
 import os
+
+# Cada processo do Tesseract usa uma única thread do OpenMP: as imagens já são
+# processadas em paralelo, e as threads internas apenas disputariam os núcleos.
+# Definido antes de carregar o tesserocr, pois o OpenMP lê o limite ao iniciar
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import io
+import re
+import hashlib
+import shutil
+import subprocess
 import tempfile
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
 import numpy as np
 from typing import List, Optional, Union, Tuple, Dict, Any
 
+# Caminho absoluto do executável do Tesseract, resolvido uma única vez em vez
+# de a cada processo iniciado pelo pytesseract
+if pytesseract.pytesseract.tesseract_cmd == "tesseract":
+    pytesseract.pytesseract.tesseract_cmd = shutil.which("tesseract") or "tesseract"
+
+# API do Tesseract em processo (opcional): evita iniciar um processo e
+# recarregar o modelo de idioma a cada imagem
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# OpenCV (opcional): filtros mais rápidos e detecção de botões
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Bibliotecas de PDF (opcionais): PyMuPDF é preferido; pdf2image requer o Poppler
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    import pdf2image
+except ImportError:
+    pdf2image = None
+
+# Detecção do tipo MIME (opcional): sem ela, o tipo é deduzido pela extensão
+try:
+    import magic
+except ImportError:
+    magic = None
+
+# Configuração padrão do Tesseract: só o motor LSTM (--oem 1), que com os
+# modelos "tessdata_fast" (pesos inteiros de 8 bits) é o mais rápido na CPU
+CONFIG_TESSERACT_PADRAO = "--oem 1 --psm 3"
+
+# Marcações de contexto ("[Nível 2]", "[Caminho: /a/b]", ...) lidas por extrair_info_contexto
+_TAG_CONTEXTO_RE = re.compile(r"\[(Nível|Caminho|Tipo|Menu|Categoria)(:?) ([^\]]*)\]")
+
+# Correções aplicadas ao texto do OCR (ver _corrigir_texto_ocr)
+_LIGADURAS = str.maketrans({"ﬁ": "fi", "ﬂ": "fl", "ﬀ": "ff", "ﬃ": "ffi", "ﬄ": "ffl"})
+_LETRA_O_ENTRE_DIGITOS_RE = re.compile(r"(?<=\d)O(?=\d)")
+_ESPACOS_FINAIS_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_LINHAS_EM_BRANCO_RE = re.compile(r"\n(?:[ \t]*\n)+")
+
+# Uma imagem é considerada em branco (e não passa pelo OCR) quando menos de
+# PROPORCAO_MIN_TINTA dos pixels são mais escuros que LIMIAR_TINTA
+LIMIAR_TINTA = 200
+PROPORCAO_MIN_TINTA = 0.001
+
+# Cache em memória (LRU) dos textos extraídos por extrair_texto_de_imagens
+TAMANHO_CACHE_OCR = 1024
+
+# Número máximo de PDFs no cache de extrair_texto_de_pdf
+TAMANHO_CACHE_PDF = 256
+_CACHE_OCR: "OrderedDict[str, str]" = OrderedDict()
+_CACHE_OCR_LOCK = threading.Lock()
+
+# Termos relevantes procurados no texto, na ordem em que são reportados
+TERMOS_IMPORTANTES = [
+    "comunicado", "guia rápido", "assistência", "seguros", 
+    "atendimento", "procedimento", "telefone", "contato",
+    "reembolso", "fluxo", "busca", "cliente"
+]
+_TERMOS_IMPORTANTES_RE = re.compile("|".join(map(re.escape, TERMOS_IMPORTANTES)), re.IGNORECASE)
+
+# Termos que definem o tipo, o menu e a categoria nas marcações de contexto
+_TERMOS_CONTEXTO_RE = re.compile(
+    r"comunicado|guia rápido|assistências|assistencias|seguros|seguradoras",
+    re.IGNORECASE
+)
+
+def _corrigir_texto_ocr(texto: str) -> str:
+    """
+    Corrige erros típicos do Tesseract no texto extraído, sem um novo OCR.
+    
+    Troca "O" por "0" entre dígitos (telefones, códigos, datas), desfaz
+    ligaduras tipográficas, remove espaços no fim das linhas e reduz cada sequência de linhas em branco a uma só (os
+    parágrafos são mantidos).
+    
+    Args:
+        texto: Texto retornado pelo Tesseract
+        
+    Returns:
+        Texto corrigido
+    """
+    texto = texto.translate(_LIGADURAS)
+    texto = _LETRA_O_ENTRE_DIGITOS_RE.sub("0", texto)
+    texto = _ESPACOS_FINAIS_RE.sub("", texto)
+    return _LINHAS_EM_BRANCO_RE.sub("\n\n", texto)
+
+# Instâncias do tesserocr de cada thread (a API não é thread-safe, mas
+# libera o GIL durante o reconhecimento, então threads rodam em paralelo)
+_TESSEROCR_LOCAL = threading.local()
+
+# Executor compartilhado pelo OCR em lote; as threads são mantidas entre as
+# chamadas para que cada uma reaproveite a sua instância do tesserocr
+_EXECUTOR_OCR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_OCR_LOCK = threading.Lock()
+
+def _obter_executor_ocr() -> ThreadPoolExecutor:
+    """
+    Retorna o executor compartilhado do OCR, criando-o na primeira chamada.
+
+    Returns:
+        ThreadPoolExecutor com uma thread por CPU
+    """
+    global _EXECUTOR_OCR
+    with _EXECUTOR_OCR_LOCK:
+        if _EXECUTOR_OCR is None:
+            _EXECUTOR_OCR = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="ocr"
+            )
+        return _EXECUTOR_OCR
+
+def _opcoes_tesserocr(config_tesseract: str) -> Optional[Tuple[int, int]]:
+    """
+    Extrai o modo de segmentação e o motor de OCR para o tesserocr.
+
+    O tesserocr só é usado quando a configuração contém apenas --psm e
+    --oem; outras opções são repassadas ao executável pelo pytesseract.
+
+    Args:
+        config_tesseract: Configurações adicionais para o Tesseract
+
+    Returns:
+        Tupla (psm, oem) ou None se o tesserocr não puder ser usado
+    """
+    if tesserocr is None:
+        return None
+    if re.sub(r"--(psm|oem)\s+\d+", "", config_tesseract).strip():
+        return None
+    opcoes = dict(re.findall(r"--(psm|oem)\s+(\d+)", config_tesseract))
+    return (
+        int(opcoes.get("psm", tesserocr.PSM.AUTO)),
+        int(opcoes.get("oem", tesserocr.OEM.DEFAULT))
+    )
+
+def _obter_api_tesserocr(idioma: str, psm: int, oem: int):
+    """
+    Retorna a instância do Tesseract em processo da thread atual.
+    
+    Cada thread cria a sua instância (uma por combinação de parâmetros) na
+    primeira chamada e a reaproveita nas seguintes.
+    
+    Args:
+        idioma: Código do idioma para o Tesseract
+        psm: Modo de segmentação de página
+        oem: Motor de OCR
+        
+    Returns:
+        API do tesserocr ou None se a API não puder ser iniciada
+    """
+    apis = getattr(_TESSEROCR_LOCAL, "apis", None)
+    if apis is None:
+        apis = _TESSEROCR_LOCAL.apis = {}
+    chave = (idioma, psm, oem)
+    if chave not in apis:
+        try:
+            apis[chave] = tesserocr.PyTessBaseAPI(lang=idioma, psm=psm, oem=oem)
+        except RuntimeError:
+            apis[chave] = None
+    return apis[chave]
+
+def _ocr_imagem(img: Image.Image, idioma: str, config_tesseract: str) -> str:
+    """
+    Aplica OCR em uma imagem, com o tesserocr se disponível ou com o pytesseract.
+    
+    Args:
+        img: Objeto PIL Image
+        idioma: Código do idioma para o Tesseract
+        config_tesseract: Configurações adicionais para o Tesseract
+        
+    Returns:
+        Texto extraído da imagem
+    """
+    opcoes = _opcoes_tesserocr(config_tesseract)
+    api = _obter_api_tesserocr(idioma, *opcoes) if opcoes is not None else None
+    if api is not None:
+        api.SetImage(img)
+        return _corrigir_texto_ocr(api.GetUTF8Text())
+    
+    return _corrigir_texto_ocr(
+        pytesseract.image_to_string(img, lang=idioma, config=config_tesseract)
+    )
+
+# Núcleo do ImageFilter.SHARPEN do PIL (dividido por 16)
+_NUCLEO_NITIDEZ = np.array([[-2, -2, -2], [-2, 32, -2], [-2, -2, -2]], dtype=np.float32)
+
+def _aplicar_nitidez(arr: np.ndarray) -> None:
+    """
+    Aplica o mesmo filtro do ImageFilter.SHARPEN do PIL, no próprio array.
+    
+    Como no PIL, as bordas de 1 pixel são mantidas e o resultado é
+    arredondado para o inteiro mais próximo.
+    
+    Args:
+        arr: Imagem uint8 (H, W) ou (H, W, 3), alterada no lugar
+    """
+    soma = cv2.filter2D(arr, cv2.CV_32F, _NUCLEO_NITIDEZ)
+    soma += 8.0
+    soma *= 1.0 / 16.0
+    np.floor(soma, out=soma)
+    np.clip(soma, 0, 255, out=soma)
+    arr[1:-1, 1:-1] = soma[1:-1, 1:-1]
+
 def pre_processar_imagem(
     img: Image.Image, 
     aumentar_contraste: bool = True,
     escala_cinza: bool = True,
     nitidez: bool = True,
     remover_ruido: bool = True,
-    binarizacao: bool = False
+    binarizacao: bool = False,
+    reduzir_resolucao: bool = True
 ) -> Image.Image:
     """
     Aplica técnicas de pré-processamento para melhorar a qualidade do OCR.
@@ -30,6 +254,8 @@ def pre_processar_imagem(
         nitidez: Se deve aumentar a nitidez
         remover_ruido: Se deve remover ruído
         binarizacao: Se deve aplicar binarização
+        reduzir_resolucao: Se deve reduzir imagens (em tons de cinza) com
+            letras maiores que o necessário para o OCR
         
     Returns:
         Imagem processada
@@ -39,9 +265,36 @@ def pre_processar_imagem(
         img = img.convert('RGB')
     
     # Converte para escala de cinza
-    if escala_cinza:
+    if escala_cinza and img.mode != 'L':
         img = img.convert('L')
     
+    # Reduz a resolução antes dos filtros, que passam a processar menos pixels
+    if reduzir_resolucao and cv2 is not None and img.mode == 'L' and min(img.size) >= 3:
+        img = _reduzir_para_ocr(img)
+    
+    # Com o OpenCV, contraste, ruído e nitidez são aplicados em um único buffer
+    if cv2 is not None and img.mode in ('L', 'RGB') and min(img.size) >= 3:
+        # np.asarray já recebe uma cópia dos pixels do PIL (somente leitura);
+        # cada filtro grava em um novo buffer, sem outra cópia de entrada
+        arr = np.asarray(img)
+        
+        # Mesmo resultado do ImageEnhance.Contrast(2.0): 2 * pixel - média
+        if aumentar_contraste:
+            cinza = arr if img.mode == 'L' else np.asarray(img.convert('L'))
+            media = int(cinza.mean() + 0.5)
+            arr = cv2.addWeighted(arr, 2.0, arr, 0.0, -media)
+        
+        if remover_ruido:
+            arr = cv2.medianBlur(arr, 3)
+        
+        if nitidez:
+            if not arr.flags.writeable:
+                arr = arr.copy()
+            _aplicar_nitidez(arr)
+        
+        img = Image.fromarray(arr, img.mode)
+        aumentar_contraste = remover_ruido = nitidez = False
+    
     # Aumenta o contraste
     if aumentar_contraste:
         enhancer = ImageEnhance.Contrast(img)
@@ -57,12 +310,101 @@ def pre_processar_imagem(
     
     # Binarização adaptativa (preto e branco)
     if binarizacao:
-        # Limiarização simples
-        fn = lambda x: 255 if x > 128 else 0
-        img = img.convert('L').point(fn, mode='1')
+        if img.mode != 'L':
+            img = img.convert('L')
+        if cv2 is not None:
+            # Limiar local (média gaussiana da vizinhança), robusto a
+            # iluminação irregular de fotos e bordas de digitalização
+            binaria = cv2.adaptiveThreshold(
+                np.asarray(img), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                JANELA_BINARIZACAO, DESLOCAMENTO_BINARIZACAO
+            )
+            img = Image.fromarray(binaria > 0)
+        else:
+            # Limiarização simples, em uma única comparação vetorizada
+            img = Image.fromarray(np.asarray(img) > 128)
     
     return img
 
+# Tamanho (ímpar, em pixels) da vizinhança e deslocamento do limiar da binarização adaptativa
+JANELA_BINARIZACAO = 31
+DESLOCAMENTO_BINARIZACAO = 10
+
+# Ranges de cor para botões amarelos (como observado nas capturas)
+AMARELO_HSV_MIN = np.array([20, 100, 100])
+AMARELO_HSV_MAX = np.array([40, 255, 255])
+
+# Fator de redução da miniatura usada para verificar se há botões na imagem
+FATOR_MINIATURA_BOTOES = 8
+
+# Proporção mínima da caixa coberta pela cor do botão e razão largura/altura aceita
+PREENCHIMENTO_MINIMO_BOTAO = 0.5
+PROPORCAO_MAXIMA_BOTAO = 20.0
+
+# Resolução da amostra usada para medir o tamanho das letras de uma página,
+# resoluções de OCR possíveis e altura mínima (em pixels) dos caracteres no OCR
+DPI_AMOSTRA = 72
+RESOLUCOES_OCR = (150, 200, 300)
+ALTURA_MINIMA_GLIFO_PX = 16
+
+# Páginas convertidas em imagem (e mantidas em disco) de cada vez pelo pdf2image
+PAGINAS_POR_BLOCO_PDF = 32
+
+# Tamanho mínimo e proporção mínima de letras para que a camada de texto de
+# uma página seja usada no lugar do OCR
+MIN_CARACTERES_TEXTO_NATIVO = 40
+PROPORCAO_MIN_LETRAS_TEXTO_NATIVO = 0.5
+
+# Altura (em pixels) dos caracteres acima da qual a imagem é reduzida antes
+# do OCR, e altura que os caracteres passam a ter após a redução
+ALTURA_MAXIMA_GLIFO_PX = 50
+ALTURA_ALVO_GLIFO_PX = 40
+
+# Confiança mínima do Tesseract (0-100) para uma palavra compor o texto de um botão
+CONFIANCA_MINIMA_BOTAO = 30
+
+def _filtrar_caixas_botoes(contours, mask: np.ndarray, escala: int = 2) -> np.ndarray:
+    """
+    Seleciona, de uma vez para todos os contornos, as caixas com forma de botão.
+    
+    Uma caixa é mantida se tiver o tamanho mínimo de um botão (mais de
+    50x20 pixels na imagem original), se estiver preenchida pela cor do
+    botão em pelo menos PREENCHIMENTO_MINIMO_BOTAO e se não for mais
+    alongada que PROPORCAO_MAXIMA_BOTAO.
+    
+    Args:
+        contours: Contornos encontrados na máscara
+        mask: Máscara binária (0/255) da cor dos botões
+        escala: Fator entre a máscara e a imagem original
+        
+    Returns:
+        Matriz (N, 4) int32 com x, y, largura e altura das caixas, na escala da máscara
+    """
+    if not contours:
+        return np.empty((0, 4), dtype=np.int32)
+    
+    caixas = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32)
+    x, y, w, h = caixas.T
+    
+    # Tamanho mínimo para ser um botão, medido na imagem original
+    tamanho_ok = (w * escala > 50) & (h * escala > 20)
+    
+    # Soma da máscara em cada caixa, pela imagem integral
+    integral = cv2.integral(mask, sdepth=cv2.CV_32S)
+    soma = (
+        integral[y + h, x + w] - integral[y, x + w]
+        - integral[y + h, x] + integral[y, x]
+    )
+    preenchimento = soma / (255.0 * w * h)
+    
+    proporcao = w / np.maximum(h, 1)
+    botoes = (
+        tamanho_ok
+        & (preenchimento >= PREENCHIMENTO_MINIMO_BOTAO)
+        & (proporcao <= PROPORCAO_MAXIMA_BOTAO)
+    )
+    return caixas[botoes]
+
 def detectar_botoes_e_menus(img: Image.Image) -> List[Dict[str, Any]]:
     """
     Tenta detectar botões e elementos de menu em uma imagem.
@@ -73,48 +415,87 @@ def detectar_botoes_e_menus(img: Image.Image) -> List[Dict[str, Any]]:
     Returns:
         Lista de dicionários com informações sobre botões detectados
     """
-    # Converte para array numpy para processamento
-    img_array = np.array(img)
     botoes_detectados = []
+    if cv2 is None:
+        return botoes_detectados
     
     # Implementação simples: detecta retângulos por segmentação de cor
     # Isso funciona melhor para botões com cores específicas como observado nas imagens
     
     # Converte para HSV para melhor segmentação de cor
     try:
-        import cv2
-        img_rgb = img.convert('RGB')
-        img_np = np.array(img_rgb)
+        # Image.reduce não aceita imagens com paleta ('P'), binárias ('1')
+        # ou de 16 bits (GIFs, PNGs com paleta etc.)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        # Verificação prévia em uma miniatura (1/64 dos pixels): sem nenhum
+        # pixel amarelo, a imagem não tem botões e o resto é dispensado
+        if min(img.size) >= 8 * FATOR_MINIATURA_BOTOES:
+            miniatura = img.reduce(FATOR_MINIATURA_BOTOES)
+            miniatura_np = np.asarray(miniatura if miniatura.mode == 'RGB' else miniatura.convert('RGB'))
+            miniatura_hsv = cv2.cvtColor(miniatura_np, cv2.COLOR_RGB2HSV)
+            if not cv2.inRange(miniatura_hsv, AMARELO_HSV_MIN, AMARELO_HSV_MAX).any():
+                return botoes_detectados
+        
+        img_np = np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+        
+        # A detecção é feita na metade da resolução (1/4 dos pixels);
+        # as coordenadas são reescaladas para a imagem original
+        escala = 1
+        if min(img_np.shape[:2]) >= 2:
+            img_np = cv2.pyrDown(img_np)
+            escala = 2
         img_hsv = cv2.cvtColor(img_np, cv2.COLOR_RGB2HSV)
         
-        # Ranges de cor para botões amarelos (como observado nas capturas)
-        lower_yellow = np.array([20, 100, 100])
-        upper_yellow = np.array([40, 255, 255])
-        mask_yellow = cv2.inRange(img_hsv, lower_yellow, upper_yellow)
+        mask_yellow = cv2.inRange(img_hsv, AMARELO_HSV_MIN, AMARELO_HSV_MAX)
         
         # Encontra contornos
         contours, _ = cv2.findContours(mask_yellow, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        # Processa cada contorno encontrado
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
+        # Descarta candidatos que não parecem botões antes de chamar o Tesseract
+        caixas = _filtrar_caixas_botoes(contours, mask_yellow, escala) * escala
+        if len(caixas) == 0:
+            return botoes_detectados
+        
+        # Uma única chamada ao Tesseract na região que contém todos os botões;
+        # as palavras são depois distribuídas entre as caixas
+        x0, y0 = caixas[:, :2].min(axis=0)
+        x1, y1 = (caixas[:, :2] + caixas[:, 2:]).max(axis=0)
+        dados = pytesseract.image_to_data(
+            img.crop((int(x0), int(y0), int(x1), int(y1))),
+            lang="por",
+            config=CONFIG_TESSERACT_PADRAO,
+            output_type=pytesseract.Output.DICT
+        )
+        palavras = np.array(dados["text"], dtype=object)
+        esquerda = np.asarray(dados["left"], dtype=np.int64) + x0
+        topo = np.asarray(dados["top"], dtype=np.int64) + y0
+        direita = esquerda + np.asarray(dados["width"], dtype=np.int64)
+        base = topo + np.asarray(dados["height"], dtype=np.int64)
+        confiavel = np.asarray(dados["conf"], dtype=float) > CONFIANCA_MINIMA_BOTAO
+        
+        for x, y, w, h in caixas:
+            x, y, w, h = int(x), int(y), int(w), int(h)
             
-            # Filtra por tamanho
-            if w > 50 and h > 20:  # Tamanho mínimo para ser um botão
-                # Recorta a região do botão e extrai texto
-                roi = img.crop((x, y, x+w, y+h))
-                texto = pytesseract.image_to_string(roi, lang="por").strip()
-                
-                if texto:
-                    botoes_detectados.append({
-                        "texto": texto,
-                        "x": x,
-                        "y": y,
-                        "largura": w,
-                        "altura": h
-                    })
-    except:
-        # Se opencv não estiver disponível ou ocorrer outro erro
+            # Palavras inteiramente dentro do botão, na ordem de leitura
+            dentro = (
+                confiavel
+                & (esquerda >= x) & (direita <= x + w)
+                & (topo >= y) & (base <= y + h)
+            )
+            texto = " ".join(p for p in palavras[dentro] if p.strip()).strip()
+            
+            if texto:
+                botoes_detectados.append({
+                    "texto": texto,
+                    "x": x,
+                    "y": y,
+                    "largura": w,
+                    "altura": h
+                })
+    except (cv2.error, pytesseract.TesseractError, OSError, ValueError):
+        # Erro do OpenCV, do Tesseract ou do PIL: segue sem os botões
         pass
     
     return botoes_detectados
@@ -123,7 +504,7 @@ def extrair_texto_de_imagem(
     img_data_or_path: Union[str, bytes, Image.Image],
     idioma: str = "por+eng",
     pre_processamento: bool = True,
-    config_tesseract: str = "--psm 3",
+    config_tesseract: str = CONFIG_TESSERACT_PADRAO,
     detectar_menus: bool = True,
     nivel_hierarquico: int = 0,
     caminho_pasta: str = "/"
@@ -131,6 +512,10 @@ def extrair_texto_de_imagem(
     """
     Extrai texto de uma imagem usando OCR, com consciência de estrutura hierárquica.
     
+    O resultado fica em cache (também em disco), indexado pelo hash do
+    conteúdo da imagem e pelos parâmetros, para que a mesma imagem não
+    passe pelo OCR duas vezes.
+    
     Args:
         img_data_or_path: Caminho do arquivo, bytes ou objeto PIL Image
         idioma: Código do idioma para o Tesseract
@@ -151,154 +536,699 @@ def extrair_texto_de_imagem(
                 return "[erro: arquivo não encontrado]"
             img = Image.open(img_data_or_path)
             nome_arquivo = os.path.basename(img_data_or_path)
+            digest = _digest_arquivo(img_data_or_path)
         elif isinstance(img_data_or_path, bytes):
             # Dados binários
             img = Image.open(io.BytesIO(img_data_or_path))
             nome_arquivo = "arquivo_binario.png"
+            digest = hashlib.blake2b(img_data_or_path, digest_size=16).hexdigest()
         elif isinstance(img_data_or_path, Image.Image):
             # Já é um objeto PIL Image
             img = img_data_or_path
             nome_arquivo = "imagem.png"
+            digest = _digest_imagem(img)
         else:
             return "[erro: formato de entrada inválido]"
         
+        return _extrair_texto_de_imagem_em_cache(
+            digest, nome_arquivo, idioma, pre_processamento, config_tesseract,
+            detectar_menus, nivel_hierarquico, caminho_pasta, _img=img
+        )
+    
+    except Exception as e:
+        st.error(f"Erro ao processar imagem com OCR: {str(e)}")
+        return f"[erro ao processar imagem: {str(e)}]"
+
+def _digest_arquivo(caminho: str) -> str:
+    """
+    Calcula o hash BLAKE2b do conteúdo de um arquivo, lendo-o em blocos.
+    
+    Args:
+        caminho: Caminho do arquivo
+        
+    Returns:
+        Hash hexadecimal (16 bytes) do conteúdo
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _digest_imagem(img: Image.Image) -> str:
+    """
+    Calcula o hash BLAKE2b dos pixels de uma imagem PIL.
+    
+    Args:
+        img: Objeto PIL Image
+        
+    Returns:
+        Hash hexadecimal (16 bytes) do modo, tamanho e pixels da imagem
+    """
+    h = hashlib.blake2b(f"{img.mode}{img.size}".encode("utf-8"), digest_size=16)
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+def _digest_entrada(entrada: Union[str, bytes, Image.Image]) -> str:
+    """
+    Calcula o hash BLAKE2b de uma imagem dada por caminho, bytes ou objeto PIL Image.
+    
+    Args:
+        entrada: Caminho do arquivo, bytes ou objeto PIL Image
+        
+    Returns:
+        Hash hexadecimal (16 bytes) do conteúdo
+    """
+    if isinstance(entrada, Image.Image):
+        return _digest_imagem(entrada)
+    if isinstance(entrada, bytes):
+        return hashlib.blake2b(entrada, digest_size=16).hexdigest()
+    return _digest_arquivo(entrada)
+
+@st.cache_data(persist="disk", show_spinner=False)
+def _extrair_texto_de_imagem_em_cache(
+    digest: str,
+    nome_arquivo: str,
+    idioma: str,
+    pre_processamento: bool,
+    config_tesseract: str,
+    detectar_menus: bool,
+    nivel_hierarquico: int,
+    caminho_pasta: str,
+    _img: Image.Image
+) -> str:
+    """
+    Aplica OCR em uma imagem; o resultado fica em cache pelo hash da imagem.
+    
+    A imagem (`_img`) não entra na chave do cache, que usa o `digest` do
+    seu conteúdo. Erros são propagados, para não ficarem em cache.
+    
+    Args:
+        digest: Hash do conteúdo da imagem
+        nome_arquivo: Nome do arquivo da imagem
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        detectar_menus: Se deve tentar detectar botões e menus na imagem
+        nivel_hierarquico: Nível hierárquico do documento
+        caminho_pasta: Caminho da pasta no SharePoint
+        _img: Objeto PIL Image
+        
+    Returns:
+        Texto extraído da imagem com informações de contexto
+    """
+    img = _img
+    
+    # Imagens em branco (sem tinta) não passam pelo Tesseract
+    if _imagem_em_branco(img):
+        texto = ""
+    else:
         # Aplica pré-processamento
         if pre_processamento:
             img_processada = pre_processar_imagem(img)
         else:
             img_processada = img
         
-        # Extrai o texto usando pytesseract
-        texto = pytesseract.image_to_string(img_processada, lang=idioma, config=config_tesseract)
-        
-        # Limpa o texto e remove caracteres problemáticos
-        texto = texto.strip()
+        # Extrai o texto usando o Tesseract
+        texto = _ocr_imagem(img_processada, idioma, config_tesseract)
+    
+    # Limpa o texto e remove caracteres problemáticos
+    texto = texto.strip()
+    
+    # Detecta botões e menus
+    elementos_interface = _descrever_elementos_interface(img) if detectar_menus else ""
+    
+    # Adiciona informações de contexto hierárquico
+    texto = _adicionar_contexto(texto, nome_arquivo, nivel_hierarquico, caminho_pasta)
+    
+    # Adiciona informações sobre elementos de interface detectados
+    if elementos_interface:
+        texto += "\n" + elementos_interface
+    
+    # Retorna o resultado ou uma mensagem de erro
+    return texto if texto else "[imagem sem texto legível]"
+
+def _descrever_elementos_interface(img: Union[str, Image.Image]) -> str:
+    """
+    Descreve os botões e menus detectados em uma imagem.
+    
+    A detecção é só uma anotação: se falhar, a imagem fica sem a lista de
+    elementos, mas o texto do OCR é mantido.
+    
+    Args:
+        img: Caminho da imagem ou objeto PIL Image
         
-        # Detecta botões e menus
-        elementos_interface = []
-        if detectar_menus:
+    Returns:
+        Lista dos elementos de interface detectados, ou string vazia se não houver
+    """
+    try:
+        if isinstance(img, str):
+            with Image.open(img) as imagem:
+                botoes = detectar_botoes_e_menus(imagem.convert('RGB'))
+        else:
             botoes = detectar_botoes_e_menus(img)
-            if botoes:
-                elementos_interface.append("\n\nElementos de interface detectados:")
-                for i, botao in enumerate(botoes):
-                    elementos_interface.append(f"- Botão {i+1}: '{botao['texto']}'")
-        
-        # Adiciona informações de contexto hierárquico
-        contexto = []
-        if nivel_hierarquico > 0:
-            contexto.append(f"[Nível {nivel_hierarquico}]")
-        
-        if caminho_pasta and caminho_pasta != "/":
-            contexto.append(f"[Caminho: {caminho_pasta}]")
-        
-        # Identifica tipo de conteúdo com base no nome do arquivo ou texto
-        if "guia" in nome_arquivo.lower():
-            contexto.append("[Tipo: Guia]")
-        elif "comunicado" in nome_arquivo.lower() or "comunicado" in texto.lower():
-            contexto.append("[Tipo: Comunicado]")
-        
-        # Tenta identificar menus e categorias
-        if "guia rápido" in texto.lower():
-            contexto.append("[Menu: Guia Rápido]")
-        elif "assistências" in texto.lower() or "assistencias" in texto.lower():
-            contexto.append("[Categoria: Assistências]")
-        elif "seguros" in texto.lower() or "seguradoras" in texto.lower():
-            contexto.append("[Categoria: Seguros]")
+    except Exception:
+        return ""
+    if not botoes:
+        return ""
+    
+    elementos_interface = ["\n\nElementos de interface detectados:"]
+    for i, botao in enumerate(botoes):
+        elementos_interface.append(f"- Botão {i+1}: '{botao['texto']}'")
+    return "\n".join(elementos_interface)
+
+def _adicionar_contexto(
+    texto: str,
+    nome_arquivo: str,
+    nivel_hierarquico: int,
+    caminho_pasta: str
+) -> str:
+    """
+    Adiciona ao texto de uma imagem ou documento as marcações de contexto hierárquico.
+    
+    Os termos que definem o tipo, o menu e a categoria são procurados em
+    uma única passada pelo texto, sem criar uma cópia em minúsculas.
+    
+    Args:
+        texto: Texto extraído da imagem ou documento
+        nome_arquivo: Nome do arquivo
+        nivel_hierarquico: Nível hierárquico do documento
+        caminho_pasta: Caminho da pasta no SharePoint
         
+    Returns:
+        Texto com as marcações de contexto no início, se houver
+    """
+    contexto = []
+    if nivel_hierarquico > 0:
+        contexto.append(f"[Nível {nivel_hierarquico}]")
+    
+    if caminho_pasta and caminho_pasta != "/":
+        contexto.append(f"[Caminho: {caminho_pasta}]")
+    
+    termos = {termo.lower() for termo in _TERMOS_CONTEXTO_RE.findall(texto)}
+    nome_lower = nome_arquivo.lower()
+    
+    # Identifica tipo de conteúdo com base no nome do arquivo ou texto
+    if "guia" in nome_lower:
+        contexto.append("[Tipo: Guia]")
+    elif "comunicado" in nome_lower or "comunicado" in termos:
+        contexto.append("[Tipo: Comunicado]")
+    
+    # Tenta identificar menus e categorias
+    if "guia rápido" in termos:
+        contexto.append("[Menu: Guia Rápido]")
+    elif "assistências" in termos or "assistencias" in termos:
+        contexto.append("[Categoria: Assistências]")
+    elif "seguros" in termos or "seguradoras" in termos:
+        contexto.append("[Categoria: Seguros]")
+    
     # Adiciona a informação hierárquica ao texto
-        if contexto:
-            texto = " ".join(contexto) + "\n\n" + texto
+    if contexto:
+        texto = " ".join(contexto) + "\n\n" + texto
+    return texto
+
+def _carregar_imagem(img_data_or_path: Union[str, bytes, Image.Image]) -> Image.Image:
+    """
+    Carrega uma imagem a partir de caminho, bytes ou objeto PIL Image.
+
+    Args:
+        img_data_or_path: Caminho do arquivo, bytes ou objeto PIL Image
+
+    Returns:
+        Objeto PIL Image
+    """
+    if isinstance(img_data_or_path, Image.Image):
+        return img_data_or_path
+    if isinstance(img_data_or_path, bytes):
+        return Image.open(io.BytesIO(img_data_or_path))
+    if isinstance(img_data_or_path, str):
+        return Image.open(img_data_or_path)
+    raise ValueError("formato de entrada inválido")
+
+def _ocr_lote_tesseract(caminhos: List[str], idioma: str, config_tesseract: str, temp_dir: str) -> List[str]:
+    """
+    Executa o Tesseract uma única vez sobre uma lista de arquivos de imagem.
+
+    Args:
+        caminhos: Caminhos das imagens já gravadas em disco
+        idioma: Código do idioma para o Tesseract
+        config_tesseract: Configurações adicionais para o Tesseract
+        temp_dir: Pasta onde o arquivo de lista será criado
+
+    Returns:
+        Lista com o texto de cada imagem, na mesma ordem da entrada
+    """
+    # O Tesseract trata um arquivo .txt como lista de imagens
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".txt", dir=temp_dir, delete=False, encoding="utf-8"
+    ) as f:
+        f.write("\n".join(caminhos) + "\n")
+        caminho_lista = f.name
+
+    texto = pytesseract.image_to_string(caminho_lista, lang=idioma, config=config_tesseract)
+
+    # O resultado de cada imagem é separado por um form feed
+    partes = texto.split("\f")
+    return [
+        _corrigir_texto_ocr(partes[i]).strip() if i < len(partes) else ""
+        for i in range(len(caminhos))
+    ]
+
+def _imagem_em_branco(img: Image.Image) -> bool:
+    """
+    Indica se uma imagem está em branco (praticamente sem pixels escuros).
+
+    Args:
+        img: Objeto PIL Image
+
+    Returns:
+        True se menos de PROPORCAO_MIN_TINTA dos pixels forem mais escuros que LIMIAR_TINTA
+    """
+    cinza = np.asarray(img if img.mode == 'L' else img.convert('L'))
+    return np.count_nonzero(cinza < LIMIAR_TINTA) < PROPORCAO_MIN_TINTA * cinza.size
+
+def _ocr_grupo(
+    imagens: List[Union[str, bytes, Image.Image]],
+    indices: List[int],
+    idioma: str,
+    pre_processamento: bool,
+    config_tesseract: str,
+    temp_dir: str
+) -> List[str]:
+    """
+    Pré-processa um grupo de imagens e aplica OCR em uma única chamada ao Tesseract.
+
+    Não chama o Streamlit, para poder rodar fora da thread do script.
+
+    Args:
+        imagens: Lista completa de imagens
+        indices: Índices das imagens do grupo
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        temp_dir: Pasta para as imagens temporárias
+
+    Returns:
+        Lista com o texto de cada imagem do grupo
+    """
+    textos = [""] * len(indices)
+
+    # Com o tesserocr, cada imagem é reconhecida em processo pela
+    # instância da thread atual, sem gravar arquivos temporários
+    opcoes = _opcoes_tesserocr(config_tesseract)
+    if opcoes is not None and _obter_api_tesserocr(idioma, *opcoes) is not None:
+        for k, i in enumerate(indices):
+            img = _carregar_imagem(imagens[i])
+            if _imagem_em_branco(img):
+                continue
+            if pre_processamento:
+                img = pre_processar_imagem(img)
+            textos[k] = _ocr_imagem(img, idioma, config_tesseract).strip()
+        return textos
+
+    caminhos = []
+    com_tinta = []
+    for k, i in enumerate(indices):
+        entrada = imagens[i]
+        img = _carregar_imagem(entrada)
+
+        # Imagens em branco (sem tinta) não passam pelo Tesseract
+        if _imagem_em_branco(img):
+            continue
+        com_tinta.append(k)
+
+        # Caminhos sem pré-processamento são usados diretamente
+        if isinstance(entrada, str) and not pre_processamento:
+            caminhos.append(os.path.abspath(entrada))
+            continue
+
+        if pre_processamento:
+            img = pre_processar_imagem(img)
+
+        caminho = os.path.join(temp_dir, f"imagem_{i:04d}.png")
+        img.save(caminho)
+        caminhos.append(caminho)
+
+    if caminhos:
+        resultados = _ocr_lote_tesseract(caminhos, idioma, config_tesseract, temp_dir)
+        for k, texto in zip(com_tinta, resultados):
+            textos[k] = texto
+
+    return textos
+
+def _area_imagem(entrada: Union[str, bytes, Image.Image]) -> int:
+    """
+    Calcula a área (em pixels) de uma imagem, lendo apenas o cabeçalho se necessário.
+
+    Args:
+        entrada: Caminho do arquivo, bytes ou objeto PIL Image
+
+    Returns:
+        Largura x altura da imagem
+    """
+    if isinstance(entrada, Image.Image):
+        return entrada.width * entrada.height
+    with _carregar_imagem(entrada) as img:
+        return img.width * img.height
+
+def _distribuir_por_area(areas: List[int], n_grupos: int) -> List[List[int]]:
+    """
+    Distribui as imagens entre grupos com área total (em pixels) equilibrada.
+
+    As imagens maiores são distribuídas primeiro, cada uma para o grupo
+    com menor área acumulada, para que nenhum processo do Tesseract fique
+    com todas as páginas grandes.
+
+    Args:
+        areas: Área (largura x altura) de cada imagem
+        n_grupos: Número de grupos
+
+    Returns:
+        Lista de grupos, cada um com os índices das imagens em ordem crescente
+    """
+    grupos: List[List[int]] = [[] for _ in range(n_grupos)]
+    heap = [(0, g) for g in range(n_grupos)]
+    for i in sorted(range(len(areas)), key=lambda i: areas[i], reverse=True):
+        total, g = heapq.heappop(heap)
+        grupos[g].append(i)
+        heapq.heappush(heap, (total + areas[i], g))
+    return [sorted(grupo) for grupo in grupos if grupo]
+
+def extrair_texto_de_imagens(
+    imagens: List[Union[str, bytes, Image.Image]],
+    idioma: str = "por+eng",
+    pre_processamento: bool = True,
+    config_tesseract: str = CONFIG_TESSERACT_PADRAO,
+    max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Extrai texto de várias imagens em lotes processados pelo Tesseract.
+
+    As imagens são divididas em até `max_workers` grupos com área total
+    equilibrada e cada grupo é listado em um arquivo de texto que um único
+    processo do Tesseract processa de uma vez, evitando recarregar o modelo
+    de idioma a cada imagem. Os grupos (pré-processamento e OCR) rodam em
+    paralelo, cada um no seu próprio processo.
+    
+    Os textos ficam em um cache LRU em memória, indexado pelo hash do
+    conteúdo de cada imagem e pelos parâmetros do OCR: páginas repetidas
+    (no mesmo lote ou em chamadas seguintes) não passam de novo pelo Tesseract.
+
+    Args:
+        imagens: Lista de caminhos, bytes ou objetos PIL Image
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        max_workers: Número de processos do Tesseract em paralelo
+            (None = número de CPUs)
+
+    Returns:
+        Lista com o texto extraído de cada imagem, na mesma ordem da entrada
+    """
+    try:
+        return _extrair_texto_de_imagens(
+            imagens, idioma, pre_processamento, config_tesseract, max_workers
+        )
+    except Exception as e:
+        st.error(f"Erro ao processar imagens com OCR: {str(e)}")
+        return [f"[erro ao processar imagem: {str(e)}]"] * len(imagens)
+
+def _extrair_texto_de_imagens(
+    imagens: List[Union[str, bytes, Image.Image]],
+    idioma: str = "por+eng",
+    pre_processamento: bool = True,
+    config_tesseract: str = CONFIG_TESSERACT_PADRAO,
+    max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Implementação de extrair_texto_de_imagens, sem chamadas ao Streamlit.
+
+    Erros são propagados; usada também pelas funções em cache dos PDFs.
+
+    Args:
+        imagens: Lista de caminhos, bytes ou objetos PIL Image
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        max_workers: Número de processos do Tesseract em paralelo
+            (None = número de CPUs)
+
+    Returns:
+        Lista com o texto extraído de cada imagem, na mesma ordem da entrada
+    """
+    if not imagens:
+        return []
+
+    # Imagens já processadas (ou repetidas no próprio lote) saem do cache
+    chaves = [
+        f"{_digest_entrada(e)}|{idioma}|{pre_processamento}|{config_tesseract}"
+        for e in imagens
+    ]
+    textos: List[Optional[str]] = [None] * len(imagens)
+    with _CACHE_OCR_LOCK:
+        for i, chave in enumerate(chaves):
+            texto = _CACHE_OCR.get(chave)
+            if texto is not None:
+                _CACHE_OCR.move_to_end(chave)
+                textos[i] = texto
+
+    primeiro_indice: Dict[str, int] = {}
+    for i, chave in enumerate(chaves):
+        if textos[i] is None:
+            primeiro_indice.setdefault(chave, i)
+    pendentes = sorted(primeiro_indice.values())
+
+    if pendentes:
+        resultados = _ocr_imagens_em_grupos(
+            imagens, pendentes, idioma, pre_processamento, config_tesseract, max_workers
+        )
+        with _CACHE_OCR_LOCK:
+            for i, texto in zip(pendentes, resultados):
+                textos[i] = texto
+                _CACHE_OCR[chaves[i]] = texto
+                _CACHE_OCR.move_to_end(chaves[i])
+            while len(_CACHE_OCR) > TAMANHO_CACHE_OCR:
+                _CACHE_OCR.popitem(last=False)
+
+    # Repetições no lote recebem o texto da primeira ocorrência
+    return [
+        texto if texto is not None else textos[primeiro_indice[chave]]
+        for texto, chave in zip(textos, chaves)
+    ]
+
+def _ocr_imagens_em_grupos(
+    imagens: List[Union[str, bytes, Image.Image]],
+    indices: List[int],
+    idioma: str,
+    pre_processamento: bool,
+    config_tesseract: str,
+    max_workers: Optional[int]
+) -> List[str]:
+    """
+    Aplica OCR em parte das imagens, em grupos processados em paralelo.
+    
+    Args:
+        imagens: Lista completa de imagens
+        indices: Índices (em ordem crescente) das imagens a processar
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        max_workers: Número de processos do Tesseract em paralelo
+            (None = número de CPUs)
+        
+    Returns:
+        Lista com o texto de cada imagem, na mesma ordem dos índices
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(indices)))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Distribui as imagens entre os grupos, preservando os índices
+        grupos = [
+            [indices[k] for k in grupo]
+            for grupo in _distribuir_por_area(
+                [_area_imagem(imagens[i]) for i in indices], max_workers
+            )
+        ]
+
+        # Cada thread do executor compartilhado pré-processa as imagens do
+        # seu grupo e as reconhece com a sua instância do tesserocr (ou
+        # aguarda o seu processo do Tesseract)
+        resultados_grupos = list(_obter_executor_ocr().map(
+            lambda grupo: _ocr_grupo(
+                imagens, grupo, idioma, pre_processamento, config_tesseract, temp_dir
+            ),
+            grupos
+        ))
+
+    # Remonta os resultados na ordem dos índices
+    textos = {}
+    for grupo, resultados in zip(grupos, resultados_grupos):
+        for i, texto in zip(grupo, resultados):
+            textos[i] = texto
+
+    return [textos[i] for i in indices]
+
+def extrair_texto_de_pdf(
+    pdf_data_or_path: Union[str, bytes],
+    idioma: str = "por+eng",
+    paginas: Optional[List[int]] = None,
+    dpi: int = 300,
+    pre_processamento: bool = True,
+    nivel_hierarquico: int = 0,
+    caminho_pasta: str = "/",
+    detectar_menus: bool = True
+) -> str:
+    """
+    Extrai texto de um PDF utilizando OCR em cada página.
+    Adaptado para estrutura hierárquica.
+    
+    O resultado fica em cache (também em disco), indexado pelo hash do
+    conteúdo do PDF e pelos parâmetros. O aviso de progresso é exibido
+    aqui, fora da função em cache, que não cria elementos do Streamlit
+    (eles seriam repetidos a cada acerto do cache).
+    
+    Args:
+        pdf_data_or_path: Caminho do arquivo ou dados binários do PDF
+        idioma: Código do idioma para o Tesseract
+        paginas: Lista de números de páginas para processar (None = todas)
+        dpi: Resolução para conversão do PDF em imagens
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        nivel_hierarquico: Nível hierárquico do documento
+        caminho_pasta: Caminho da pasta no SharePoint
+        detectar_menus: Se deve tentar detectar botões e menus nas páginas
+            sem texto (que passam pelo OCR)
         
-        # Adiciona informações sobre elementos de interface detectados
-        if elementos_interface:
-            texto += "\n" + "\n".join(elementos_interface)
+    Returns:
+        Texto extraído de todas as páginas com informações de contexto
+    """
+    try:
+        # Determina o nome do arquivo para análise de contexto
+        if isinstance(pdf_data_or_path, str):
+            nome_arquivo = os.path.basename(pdf_data_or_path)
+            # Verifica se o arquivo existe
+            if not os.path.exists(pdf_data_or_path):
+                return "[erro: arquivo PDF não encontrado]"
+            digest = _digest_arquivo(pdf_data_or_path)
+        else:
+            nome_arquivo = "arquivo.pdf"
+            digest = hashlib.blake2b(pdf_data_or_path, digest_size=16).hexdigest()
         
-        # Retorna o resultado ou uma mensagem de erro
-        return texto if texto else "[imagem sem texto legível]"
+        placeholder = st.empty()
+        placeholder.text(f"Processando {nome_arquivo}...")
+        try:
+            return _extrair_texto_de_pdf_em_cache(
+                digest, nome_arquivo, idioma, paginas, dpi, pre_processamento,
+                nivel_hierarquico, caminho_pasta, detectar_menus,
+                _pdf_data_or_path=pdf_data_or_path
+            )
+        finally:
+            placeholder.empty()
+    except _ResultadoComErro as e:
+        return e.resultado
+    except Exception as e:
+        st.error(f"Erro ao processar PDF: {str(e)}")
+        return f"[erro ao processar PDF: {str(e)}]"
+
+class _ResultadoComErro(Exception):
+    """Resultado de erro de uma função em cache, levantado para não ficar no cache."""
     
-    except Exception as e:
-        st.error(f"Erro ao processar imagem com OCR: {str(e)}")
-        return f"[erro ao processar imagem: {str(e)}]"
+    def __init__(self, resultado: str):
+        super().__init__(resultado)
+        self.resultado = resultado
 
-def extrair_texto_de_pdf(
-    pdf_data_or_path: Union[str, bytes],
-    idioma: str = "por+eng",
-    paginas: Optional[List[int]] = None,
-    dpi: int = 300,
-    pre_processamento: bool = True,
-    nivel_hierarquico: int = 0,
-    caminho_pasta: str = "/"
+@st.cache_data(persist="disk", max_entries=TAMANHO_CACHE_PDF, show_spinner=False)
+def _extrair_texto_de_pdf_em_cache(
+    digest: str,
+    nome_arquivo: str,
+    idioma: str,
+    paginas: Optional[List[int]],
+    dpi: int,
+    pre_processamento: bool,
+    nivel_hierarquico: int,
+    caminho_pasta: str,
+    detectar_menus: bool,
+    _pdf_data_or_path: Union[str, bytes]
 ) -> str:
     """
-    Extrai texto de um PDF utilizando OCR em cada página.
-    Adaptado para estrutura hierárquica.
+    Extrai texto de um PDF; o resultado fica em cache pelo hash do PDF.
+    
+    O PDF (`_pdf_data_or_path`) não entra na chave do cache, que usa o
+    `digest` do seu conteúdo. Resultados de erro são levantados como
+    _ResultadoComErro, para não ficarem em cache.
     
     Args:
-        pdf_data_or_path: Caminho do arquivo ou dados binários do PDF
+        digest: Hash do conteúdo do PDF
+        nome_arquivo: Nome do arquivo para contexto
         idioma: Código do idioma para o Tesseract
         paginas: Lista de números de páginas para processar (None = todas)
         dpi: Resolução para conversão do PDF em imagens
         pre_processamento: Se deve aplicar técnicas de pré-processamento
         nivel_hierarquico: Nível hierárquico do documento
         caminho_pasta: Caminho da pasta no SharePoint
+        detectar_menus: Se deve tentar detectar botões e menus nas páginas sem texto
+        _pdf_data_or_path: Caminho do arquivo ou dados binários do PDF
         
     Returns:
         Texto extraído de todas as páginas com informações de contexto
     """
-    try:
-        # Determina o nome do arquivo para análise de contexto
-        if isinstance(pdf_data_or_path, str):
-            nome_arquivo = os.path.basename(pdf_data_or_path)
-        else:
-            nome_arquivo = "arquivo.pdf"
-        
-        # Cria arquivo temporário se a entrada for dados binários
-        if isinstance(pdf_data_or_path, bytes):
+    em_memoria = isinstance(_pdf_data_or_path, bytes)
+    
+    if fitz is not None:
+        # Usa primeiro o PyMuPDF (mais rápido e sem dependência do Poppler);
+        # dados binários são abertos direto da memória
+        resultado = extrair_texto_de_pdf_com_pymupdf(
+            "" if em_memoria else _pdf_data_or_path, 
+            idioma=idioma,
+            pre_processamento=pre_processamento,
+            detectar_menus=detectar_menus,
+            nivel_hierarquico=nivel_hierarquico, 
+            caminho_pasta=caminho_pasta, 
+            nome_arquivo=nome_arquivo,
+            pdf_stream=_pdf_data_or_path if em_memoria else None
+        )
+    elif pdf2image is not None:
+        # Usa o pdf2image (requer Poppler), que precisa de um arquivo:
+        # grava os dados binários temporariamente
+        if em_memoria:
             with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_pdf:
-                temp_pdf.write(pdf_data_or_path)
+                temp_pdf.write(_pdf_data_or_path)
                 temp_pdf_path = temp_pdf.name
         else:
-            # Verifica se o arquivo existe
-            if not os.path.exists(pdf_data_or_path):
-                return "[erro: arquivo PDF não encontrado]"
-            temp_pdf_path = pdf_data_or_path
+            temp_pdf_path = _pdf_data_or_path
         
-        # Tenta importar bibliotecas necessárias
         try:
-            # Tenta primeiro com PyMuPDF (mais rápido e sem dependência do Poppler)
-            import fitz
-            return extrair_texto_de_pdf_com_pymupdf(
+            resultado = extrair_texto_de_pdf_com_pdf2image(
                 temp_pdf_path, 
-                nivel_hierarquico=nivel_hierarquico, 
-                caminho_pasta=caminho_pasta, 
+                idioma=idioma,
+                paginas=paginas,
+                dpi=dpi, 
+                pre_processamento=pre_processamento,
+                detectar_menus=detectar_menus,
+                nivel_hierarquico=nivel_hierarquico,
+                caminho_pasta=caminho_pasta,
                 nome_arquivo=nome_arquivo
             )
-        except ImportError:
-            try:
-                # Tenta com pdf2image (requer Poppler)
-                import pdf2image
-                return extrair_texto_de_pdf_com_pdf2image(
-                    temp_pdf_path, 
-                    idioma=idioma,
-                    paginas=paginas,
-                    dpi=dpi, 
-                    pre_processamento=pre_processamento,
-                    nivel_hierarquico=nivel_hierarquico,
-                    caminho_pasta=caminho_pasta,
-                    nome_arquivo=nome_arquivo
-                )
-            except ImportError:
-                # Se ambos falharem, tenta processar diretamente como imagem
-                return f"[erro: nenhuma biblioteca de processamento de PDF está disponível]"
-    except Exception as e:
-        st.error(f"Erro ao processar PDF: {str(e)}")
-        return f"[erro ao processar PDF: {str(e)}]"
+        finally:
+            if em_memoria:
+                os.remove(temp_pdf_path)
+    else:
+        resultado = "[erro: nenhuma biblioteca de processamento de PDF está disponível]"
+    
+    if resultado.startswith("[erro"):
+        raise _ResultadoComErro(resultado)
+    return resultado
 
 def extrair_texto_de_pdf_com_pymupdf(
     pdf_path: str,
+    idioma: str = "por+eng",
     nivel_hierarquico: int = 0,
     caminho_pasta: str = "/",
-    nome_arquivo: str = "arquivo.pdf"
+    nome_arquivo: str = "arquivo.pdf",
+    pdf_stream: Optional[bytes] = None,
+    pre_processamento: bool = True,
+    detectar_menus: bool = True
 ) -> str:
     """
     Extrai texto de um PDF usando PyMuPDF (fitz).
@@ -306,82 +1236,252 @@ def extrair_texto_de_pdf_com_pymupdf(
     
     Args:
         pdf_path: Caminho do arquivo PDF
+        idioma: Código do idioma para o OCR das páginas sem texto
         nivel_hierarquico: Nível hierárquico do documento
         caminho_pasta: Caminho da pasta no SharePoint
         nome_arquivo: Nome do arquivo para contexto
+        pdf_stream: Dados binários do PDF (se informado, `pdf_path` é ignorado)
+        pre_processamento: Se deve aplicar o pré-processamento nas páginas sem texto
+        detectar_menus: Se deve tentar detectar botões e menus nas páginas sem texto
         
     Returns:
         Texto extraído com informações de contexto
     """
+    if fitz is None:
+        return "[erro: PyMuPDF não está instalado]"
+    
     try:
-        import fitz  # PyMuPDF
-        
-        # Abre o documento
-        doc = fitz.open(pdf_path)
+        if pdf_stream is not None:
+            doc = fitz.open(stream=pdf_stream, filetype="pdf")
+        else:
+            doc = fitz.open(pdf_path)
         
-        # Extrai texto de cada página
-        textos = []
-        for i in range(len(doc)):
-            page = doc[i]
+        # Fecha o documento ao final e acumula o texto em um único buffer
+        with doc, io.StringIO() as buf:
             
-            # Tenta extrair texto diretamente
-            texto = page.get_text()
+            def adicionar_pagina(cabecalho: str, texto_pagina: str) -> None:
+                if buf.tell():
+                    buf.write("\n\n")
+                buf.write(f"--- {cabecalho} ---\n")
+                buf.write(texto_pagina)
             
-            # Se a página tiver texto
-            if texto.strip():
-                textos.append(f"--- Página {i+1} ---\n{texto}")
-            else:
-                # Se não houver texto, extrai como imagem e aplica OCR
-                pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                
-                # Converte para PIL Image
-                img_data = pix.tobytes("ppm")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Aplica OCR na imagem
-                texto_ocr = extrair_texto_de_imagem(
-                    img, 
-                    nivel_hierarquico=nivel_hierarquico,
-                    caminho_pasta=caminho_pasta
-                )
-                
-                if texto_ocr and texto_ocr != "[imagem sem texto legível]":
-                    textos.append(f"--- Página {i+1} (OCR) ---\n{texto_ocr}")
-        
-        # Combina o texto de todas as páginas
-        texto_combinado = "\n\n".join(textos) if textos else "[PDF sem texto legível]"
+            # Extrai o texto de cada página diretamente; as páginas sem
+            # texto são separadas para o OCR, feito de uma vez ao final
+            paginas: List[Tuple[str, str]] = []
+            sem_texto: List[int] = []
+            for i, page in enumerate(doc):
+                texto = page.get_text()
+                if texto.strip():
+                    paginas.append((f"Página {i+1}", texto))
+                else:
+                    paginas.append((f"Página {i+1} (OCR)", ""))
+                    sem_texto.append(i)
+            
+            resultados_ocr = _ocr_paginas_pymupdf(
+                doc, sem_texto, idioma, pre_processamento, detectar_menus
+            )
+            for i, (texto_ocr, elementos_interface) in zip(sem_texto, resultados_ocr):
+                if texto_ocr.strip() or elementos_interface:
+                    texto_ocr = _adicionar_contexto(
+                        texto_ocr, "imagem.png", nivel_hierarquico, caminho_pasta
+                    )
+                    if elementos_interface:
+                        texto_ocr += "\n" + elementos_interface
+                    paginas[i] = (paginas[i][0], texto_ocr)
+            
+            for cabecalho, texto_pagina in paginas:
+                if texto_pagina:
+                    adicionar_pagina(cabecalho, texto_pagina)
+            
+            # Combina o texto de todas as páginas
+            texto_combinado = buf.getvalue() or "[PDF sem texto legível]"
         
         # Adiciona informações de contexto hierárquico
-        contexto = []
-        if nivel_hierarquico > 0:
-            contexto.append(f"[Nível {nivel_hierarquico}]")
-        
-        if caminho_pasta and caminho_pasta != "/":
-            contexto.append(f"[Caminho: {caminho_pasta}]")
-        
-        # Identifica tipo de conteúdo com base no nome do arquivo ou texto
-        if "guia" in nome_arquivo.lower():
-            contexto.append("[Tipo: Guia]")
-        elif "comunicado" in nome_arquivo.lower() or "comunicado" in texto_combinado.lower():
-            contexto.append("[Tipo: Comunicado]")
-        
-        # Tenta identificar menus e categorias
-        if "guia rápido" in texto_combinado.lower():
-            contexto.append("[Menu: Guia Rápido]")
-        elif "assistências" in texto_combinado.lower() or "assistencias" in texto_combinado.lower():
-            contexto.append("[Categoria: Assistências]")
-        elif "seguros" in texto_combinado.lower() or "seguradoras" in texto_combinado.lower():
-            contexto.append("[Categoria: Seguros]")
-        
-        # Adiciona a informação hierárquica ao texto
-        if contexto:
-            texto_combinado = " ".join(contexto) + "\n\n" + texto_combinado
+        texto_combinado = _adicionar_contexto(
+            texto_combinado, nome_arquivo, nivel_hierarquico, caminho_pasta
+        )
         
         return texto_combinado
         
     except Exception as e:
         return f"[erro ao processar PDF com PyMuPDF: {str(e)}]"
 
+def _ocr_paginas_pymupdf(
+    doc,
+    indices: List[int],
+    idioma: str,
+    pre_processamento: bool = True,
+    detectar_menus: bool = True
+) -> List[Tuple[str, str]]:
+    """
+    Aplica OCR nas páginas sem texto de um documento do PyMuPDF.
+    
+    As páginas são renderizadas em disco e processadas em paralelo por
+    extrair_texto_de_imagens (com o mesmo pré-processamento das imagens),
+    com um processo do Tesseract por núcleo. Sem pré-processamento nem
+    detecção de menus, uma página isolada usa o OCR integrado ao PyMuPDF,
+    em processo.
+    
+    Args:
+        doc: Documento do PyMuPDF
+        indices: Índices das páginas sem texto
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        detectar_menus: Se deve tentar detectar botões e menus nas páginas
+        
+    Returns:
+        Lista com o texto e os elementos de interface detectados de cada
+        página, na mesma ordem dos índices
+    """
+    if not indices:
+        return []
+    
+    if len(indices) == 1 and not pre_processamento and not detectar_menus:
+        page = doc[indices[0]]
+        texto = _ocr_pagina_pymupdf(page, idioma, _escolher_dpi_pymupdf(page))
+        if texto is not None:
+            return [(texto, "")]
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        caminhos = []
+        for i in indices:
+            page = doc[i]
+            # Resolução de OCR conforme o tamanho das letras da página
+            dpi = _escolher_dpi_pymupdf(page)
+            caminho = os.path.join(temp_dir, f"pagina_{i:04d}.ppm")
+            page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72)).save(caminho)
+            caminhos.append(caminho)
+        
+        textos = _extrair_texto_de_imagens(
+            caminhos, idioma=idioma, pre_processamento=pre_processamento
+        )
+        elementos = [
+            _descrever_elementos_interface(caminho) if detectar_menus else ""
+            for caminho in caminhos
+        ]
+        return list(zip(textos, elementos))
+
+def _altura_mediana_glifos(cinza: np.ndarray) -> Optional[float]:
+    """
+    Mede a altura mediana (em pixels) dos caracteres de uma imagem em tons de cinza.
+    
+    Args:
+        cinza: Imagem em tons de cinza (uint8)
+        
+    Returns:
+        Altura mediana dos componentes conexos com tamanho de caractere,
+        ou None se não houver nenhum
+    """
+    _, binaria = cv2.threshold(cinza, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binaria, connectivity=8)
+    alturas = stats[1:, cv2.CC_STAT_HEIGHT]
+    
+    # Descarta ruído e elementos grandes demais para serem caracteres
+    alturas = alturas[(alturas >= 2) & (alturas <= max(2, cinza.shape[0] // 10))]
+    if alturas.size == 0:
+        return None
+    return float(np.median(alturas))
+
+def _reduzir_para_ocr(img: Image.Image) -> Image.Image:
+    """
+    Reduz uma imagem em tons de cinza cujas letras passam do tamanho ideal para o Tesseract.
+    
+    O tempo do Tesseract cresce com o número de pixels, mas letras acima
+    de ALTURA_MAXIMA_GLIFO_PX não melhoram o reconhecimento: nesse caso a
+    imagem é reduzida para que as letras fiquem com ALTURA_ALVO_GLIFO_PX.
+    
+    Args:
+        img: Objeto PIL Image no modo 'L'
+        
+    Returns:
+        Imagem reduzida ou a própria imagem
+    """
+    arr = np.asarray(img)
+    
+    # Imagens grandes são medidas na metade da resolução
+    amostra, fator = arr, 1
+    if min(arr.shape) >= 1000:
+        amostra, fator = cv2.pyrDown(arr), 2
+    
+    altura = _altura_mediana_glifos(amostra)
+    if altura is None or altura * fator <= ALTURA_MAXIMA_GLIFO_PX:
+        return img
+    
+    escala = ALTURA_ALVO_GLIFO_PX / (altura * fator)
+    tamanho = (max(1, round(img.width * escala)), max(1, round(img.height * escala)))
+    return Image.fromarray(cv2.resize(arr, tamanho, interpolation=cv2.INTER_AREA), 'L')
+
+def _escolher_dpi(amostra: np.ndarray, dpi_amostra: int = DPI_AMOSTRA, dpi_maximo: int = 300) -> int:
+    """
+    Escolhe a resolução de OCR de uma página a partir do tamanho das letras.
+    
+    Mede a altura mediana dos componentes conexos de uma amostra em baixa
+    resolução e devolve a menor resolução de RESOLUCOES_OCR em que os
+    caracteres atingem ALTURA_MINIMA_GLIFO_PX. Texto pequeno continua em
+    300 DPI; texto grande é renderizado com até 4x menos pixels.
+    
+    Args:
+        amostra: Página em tons de cinza renderizada em `dpi_amostra`
+        dpi_amostra: Resolução da amostra
+        dpi_maximo: Resolução máxima permitida
+        
+    Returns:
+        Resolução (DPI) a usar no OCR da página
+    """
+    if cv2 is None or amostra.size == 0:
+        return dpi_maximo
+    
+    altura = _altura_mediana_glifos(amostra)
+    if altura is None:
+        return min(RESOLUCOES_OCR[0], dpi_maximo)
+    
+    altura_pt = altura * 72 / dpi_amostra
+    for dpi in RESOLUCOES_OCR:
+        if dpi >= dpi_maximo:
+            return dpi_maximo
+        if altura_pt * dpi / 72 >= ALTURA_MINIMA_GLIFO_PX:
+            return dpi
+    return dpi_maximo
+
+def _escolher_dpi_pymupdf(page, dpi_maximo: int = 300) -> int:
+    """
+    Escolhe a resolução de OCR de uma página do PyMuPDF (ver _escolher_dpi).
+    
+    Args:
+        page: Página do PyMuPDF
+        dpi_maximo: Resolução máxima permitida
+        
+    Returns:
+        Resolução (DPI) a usar no OCR da página
+    """
+    if cv2 is None:
+        return dpi_maximo
+    
+    pix = page.get_pixmap(dpi=DPI_AMOSTRA, colorspace=fitz.csGRAY, alpha=False)
+    amostra = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return _escolher_dpi(amostra, DPI_AMOSTRA, dpi_maximo)
+
+def _ocr_pagina_pymupdf(page, idioma: str, dpi: int = 300) -> Optional[str]:
+    """
+    Aplica OCR em uma página com o Tesseract integrado ao PyMuPDF.
+    
+    Args:
+        page: Página do PyMuPDF
+        idioma: Código do idioma para o Tesseract
+        dpi: Resolução usada para renderizar a página
+        
+    Returns:
+        Texto da página ou None se o OCR do PyMuPDF não estiver disponível
+    """
+    if not hasattr(page, "get_textpage_ocr"):
+        return None
+    try:
+        textpage = page.get_textpage_ocr(dpi=dpi, full=True, language=idioma)
+    except RuntimeError:
+        # Tesseract ou tessdata não encontrados pelo PyMuPDF
+        return None
+    return _corrigir_texto_ocr(page.get_text("text", textpage=textpage)).strip()
+
 def extrair_texto_de_pdf_com_pdf2image(
     pdf_path: str,
     idioma: str = "por+eng",
@@ -390,7 +1490,8 @@ def extrair_texto_de_pdf_com_pdf2image(
     pre_processamento: bool = True,
     nivel_hierarquico: int = 0,
     caminho_pasta: str = "/",
-    nome_arquivo: str = "arquivo.pdf"
+    nome_arquivo: str = "arquivo.pdf",
+    detectar_menus: bool = True
 ) -> str:
     """
     Extrai texto de um PDF usando pdf2image e OCR.
@@ -400,99 +1501,279 @@ def extrair_texto_de_pdf_com_pdf2image(
         pdf_path: Caminho do arquivo PDF
         idioma: Código do idioma para o Tesseract
         paginas: Lista de números de páginas para processar (None = todas)
-        dpi: Resolução para conversão do PDF em imagens
+        dpi: Resolução máxima para conversão do PDF em imagens (a resolução
+            usada é reduzida quando as letras são grandes)
         pre_processamento: Se deve aplicar técnicas de pré-processamento
         nivel_hierarquico: Nível hierárquico do documento
         caminho_pasta: Caminho da pasta no SharePoint
         nome_arquivo: Nome do arquivo para contexto
+        detectar_menus: Se deve tentar detectar botões e menus nas páginas
+            convertidas em imagem (que então são renderizadas em cores)
         
     Returns:
         Texto extraído com informações de contexto
     """
+    if pdf2image is None:
+        return "[erro: pdf2image não está instalado]"
+    
     try:
-        import pdf2image
+        # Intervalo de páginas a processar
+        try:
+            primeira = paginas[0] if paginas else 1
+            ultima = paginas[-1] if paginas else pdf2image.pdfinfo_from_path(pdf_path)["Pages"]
+        except Exception as e:
+            # Se falhar na leitura, pode ser um problema com o Poppler
+            if "Unable to get page count" in str(e):
+                return f"[erro com Poppler: {str(e)}]"
+            return f"[erro ao converter PDF para imagens: {str(e)}]"
+        
+        # Usa a camada de texto do PDF nas páginas que a têm; só as demais
+        # são convertidas em imagem e passam pelo OCR
+        textos_paginas = _extrair_texto_nativo_pdftotext(pdf_path, primeira, ultima)
+        sem_texto = [
+            primeira + k for k, texto in enumerate(textos_paginas)
+            if not _texto_nativo_utilizavel(texto)
+        ]
         
         # Cria uma pasta temporária para as imagens extraídas
         with tempfile.TemporaryDirectory() as temp_dir:
-            # Converte o PDF em imagens
-            try:
-                imagens = pdf2image.convert_from_path(
-                    pdf_path, 
-                    dpi=dpi,
-                    first_page=paginas[0] if paginas else None,
-                    last_page=paginas[-1] if paginas else None,
-                    output_folder=temp_dir,
-                    fmt="jpeg",
-                    thread_count=4,  # Usa múltiplos threads para acelerar
-                    grayscale=pre_processamento
-                )
-            except Exception as e:
-                # Se falhar na conversão, pode ser um problema com o Poppler
-                if "Unable to get page count" in str(e):
-                    return f"[erro com Poppler: {str(e)}]"
-                return f"[erro ao converter PDF para imagens: {str(e)}]"
-            
-            # Extrai texto de cada página
-            textos = []
-            num_paginas = len(imagens)
+            elementos_interface: Dict[int, str] = {}
             
-            for i, img in enumerate(imagens):
-                # Atualiza progresso, se estiver no Streamlit
-                if hasattr(st, 'progress') and num_paginas > 1:
-                    progresso = (i + 1) / num_paginas
-                    placeholder = st.empty()
-                    placeholder.text(f"Processando página {i+1}/{num_paginas}...")
+            # Converte e aplica OCR em blocos de páginas: só as imagens de um
+            # bloco ficam em disco de cada vez, por maior que seja o PDF
+            for inicio, fim in _blocos_de_paginas(sem_texto, PAGINAS_POR_BLOCO_PDF):
+                try:
+                    imagens = _renderizar_paginas_pdf2image(
+                        pdf_path, inicio, fim, dpi, temp_dir, colorido=detectar_menus
+                    )
+                except Exception as e:
+                    return f"[erro ao converter PDF para imagens: {str(e)}]"
                 
-                # Aplica OCR na imagem
-                texto_pagina = extrair_texto_de_imagem(
-                    img, 
+                # Aplica OCR em todas as páginas do bloco de uma vez (Tesseract em lote)
+                textos_paginas[inicio - primeira:fim - primeira + 1] = _extrair_texto_de_imagens(
+                    imagens,
                     idioma=idioma,
-                    pre_processamento=pre_processamento,
-                    nivel_hierarquico=nivel_hierarquico,
-                    caminho_pasta=caminho_pasta
+                    pre_processamento=pre_processamento
                 )
                 
-                if texto_pagina and texto_pagina != "[imagem sem texto legível]":
-                    textos.append(f"--- Página {i+1} ---\n{texto_pagina}")
-                
-                # Limpa o placeholder
-                if hasattr(st, 'progress') and num_paginas > 1:
-                    placeholder.empty()
+                for pagina, caminho in zip(range(inicio, fim + 1), imagens):
+                    if detectar_menus:
+                        elementos_interface[pagina] = _descrever_elementos_interface(caminho)
+                    os.remove(caminho)
             
-            # Combina o texto de todas as páginas
-            texto_combinado = "\n\n".join(textos) if textos else "[PDF sem texto legível]"
+            # Adiciona o contexto de cada página, acumulando em um único buffer
+            with io.StringIO() as buf:
+                for i, texto_ocr in enumerate(textos_paginas):
+                    texto_pagina = _adicionar_contexto(
+                        texto_ocr, "imagem.png", nivel_hierarquico, caminho_pasta
+                    )
+                    if elementos_interface.get(primeira + i):
+                        texto_pagina += "\n" + elementos_interface[primeira + i]
+                    if texto_pagina:
+                        if buf.tell():
+                            buf.write("\n\n")
+                        buf.write(f"--- Página {i+1} ---\n")
+                        buf.write(texto_pagina)
+                
+                # Combina o texto de todas as páginas
+                texto_combinado = buf.getvalue() or "[PDF sem texto legível]"
             
             # Adiciona informações de contexto hierárquico
-            contexto = []
-            if nivel_hierarquico > 0:
-                contexto.append(f"[Nível {nivel_hierarquico}]")
-            
-            if caminho_pasta and caminho_pasta != "/":
-                contexto.append(f"[Caminho: {caminho_pasta}]")
-            
-            # Identifica tipo de conteúdo com base no nome do arquivo ou texto
-            if "guia" in nome_arquivo.lower():
-                contexto.append("[Tipo: Guia]")
-            elif "comunicado" in nome_arquivo.lower() or "comunicado" in texto_combinado.lower():
-                contexto.append("[Tipo: Comunicado]")
-            
-            # Tenta identificar menus e categorias
-            if "guia rápido" in texto_combinado.lower():
-                contexto.append("[Menu: Guia Rápido]")
-            elif "assistências" in texto_combinado.lower() or "assistencias" in texto_combinado.lower():
-                contexto.append("[Categoria: Assistências]")
-            elif "seguros" in texto_combinado.lower() or "seguradoras" in texto_combinado.lower():
-                contexto.append("[Categoria: Seguros]")
-            
-            # Adiciona a informação hierárquica ao texto
-            if contexto:
-                texto_combinado = " ".join(contexto) + "\n\n" + texto_combinado
+            texto_combinado = _adicionar_contexto(
+                texto_combinado, nome_arquivo, nivel_hierarquico, caminho_pasta
+            )
             
             return texto_combinado
     
     except Exception as e:
         return f"[erro ao processar PDF com pdf2image: {str(e)}]"
 
+def _extrair_texto_nativo_pdftotext(pdf_path: str, primeira: int, ultima: int) -> List[str]:
+    """
+    Extrai a camada de texto de um intervalo de páginas com o pdftotext do Poppler.
+    
+    Args:
+        pdf_path: Caminho do arquivo PDF
+        primeira: Número da primeira página (a partir de 1)
+        ultima: Número da última página
+        
+    Returns:
+        Lista com o texto de cada página (vazio se a página não tiver texto
+        ou se o pdftotext não estiver disponível)
+    """
+    vazios = [""] * (ultima - primeira + 1)
+    executavel = shutil.which("pdftotext")
+    if executavel is None:
+        return vazios
+    
+    try:
+        resultado = subprocess.run(
+            [executavel, "-f", str(primeira), "-l", str(ultima), "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return vazios
+    
+    # O pdftotext separa as páginas com um form feed
+    partes = resultado.stdout.decode("utf-8", errors="ignore").split("\f")
+    return [partes[k] if k < len(partes) else "" for k in range(len(vazios))]
+
+def _texto_nativo_utilizavel(texto: str) -> bool:
+    """
+    Indica se o texto nativo de uma página dispensa o OCR.
+    
+    A página precisa ter ao menos MIN_CARACTERES_TEXTO_NATIVO caracteres,
+    dos quais pelo menos PROPORCAO_MIN_LETRAS_TEXTO_NATIVO letras; menos que
+    isso indica uma página escaneada ou uma camada de texto corrompida.
+    
+    Args:
+        texto: Texto extraído da camada de texto da página
+        
+    Returns:
+        True se o texto puder ser usado diretamente
+    """
+    texto = texto.strip()
+    if len(texto) < MIN_CARACTERES_TEXTO_NATIVO:
+        return False
+    letras = sum(c.isalpha() for c in texto)
+    return letras >= PROPORCAO_MIN_LETRAS_TEXTO_NATIVO * len(texto)
+
+def _blocos_de_paginas(paginas: List[int], tamanho_maximo: int) -> List[Tuple[int, int]]:
+    """
+    Agrupa números de página em intervalos contíguos de até `tamanho_maximo` páginas.
+    
+    Args:
+        paginas: Números de página em ordem crescente
+        tamanho_maximo: Número máximo de páginas por intervalo
+        
+    Returns:
+        Lista de tuplas (primeira, última)
+    """
+    blocos: List[Tuple[int, int]] = []
+    for pagina in paginas:
+        if blocos and pagina == blocos[-1][1] + 1 and pagina - blocos[-1][0] < tamanho_maximo:
+            blocos[-1] = (blocos[-1][0], pagina)
+        else:
+            blocos.append((pagina, pagina))
+    return blocos
+
+def _renderizar_paginas_pdf2image(
+    pdf_path: str,
+    primeira: int,
+    ultima: int,
+    dpi: int,
+    temp_dir: str,
+    colorido: bool = False
+) -> List[str]:
+    """
+    Converte um intervalo de páginas de um PDF em imagens gravadas em disco.
+    
+    Apenas os caminhos são carregados, para que o Tesseract leia as imagens
+    em lote. A resolução é reduzida (até `dpi`) conforme o tamanho das
+    letras, medido em uma amostra de baixa resolução das páginas.
+    
+    Args:
+        pdf_path: Caminho do arquivo PDF
+        primeira: Número da primeira página (a partir de 1)
+        ultima: Número da última página
+        dpi: Resolução máxima para conversão
+        temp_dir: Pasta onde as imagens são gravadas
+        colorido: Se as imagens são gravadas em cores (para a detecção de
+            botões e menus) em vez de tons de cinza
+        
+    Returns:
+        Caminhos das imagens, na ordem das páginas
+    """
+    # Amostra em baixa resolução para escolher a resolução do OCR;
+    # a maior resolução exigida entre as páginas é usada para todo o intervalo
+    if cv2 is not None:
+        amostras = pdf2image.convert_from_path(
+            pdf_path,
+            dpi=DPI_AMOSTRA,
+            first_page=primeira,
+            last_page=ultima,
+            thread_count=os.cpu_count() or 1,
+            grayscale=True,
+            use_pdftocairo=True
+        )
+        dpi = max(
+            (_escolher_dpi(np.asarray(a.convert('L')), DPI_AMOSTRA, dpi) for a in amostras),
+            default=dpi
+        )
+    
+    return pdf2image.convert_from_path(
+        pdf_path, 
+        dpi=dpi,
+        first_page=primeira,
+        last_page=ultima,
+        output_folder=temp_dir,
+        # TIFF sem perdas nem decodificação; em tons de cinza (8 bits por
+        # pixel) dispensa a conversão posterior para 'L'
+        fmt="tiff",
+        grayscale=not colorido,
+        thread_count=os.cpu_count() or 1,  # Renderiza as páginas em paralelo
+        use_pdftocairo=True,  # Em geral mais rápido que o pdftoppm
+        paths_only=True
+    )
+
+def _extrair_texto_simples(
+    caminho_ou_conteudo: Union[str, bytes],
+    idioma: str = "por+eng",
+    nivel_hierarquico: int = 0,
+    caminho_pasta: str = "/"
+) -> str:
+    """
+    Lê um arquivo de texto puro, sem OCR.
+    
+    Args:
+        caminho_ou_conteudo: Caminho para o arquivo ou dados binários
+        idioma: Não utilizado (mesma assinatura dos demais extratores)
+        nivel_hierarquico: Nível hierárquico do documento
+        caminho_pasta: Caminho da pasta no SharePoint
+        
+    Returns:
+        Texto do arquivo com informações de contexto
+    """
+    # Extrai texto direto
+    if isinstance(caminho_ou_conteudo, str) and os.path.exists(caminho_ou_conteudo):
+        with open(caminho_ou_conteudo, 'r', encoding='utf-8', errors='ignore') as f:
+            texto = f.read()
+    elif isinstance(caminho_ou_conteudo, bytes):
+        texto = caminho_ou_conteudo.decode('utf-8', errors='ignore')
+    else:
+        return "[formato de arquivo não suportado]"
+    
+    # Adiciona informações de contexto
+    contexto = []
+    if nivel_hierarquico > 0:
+        contexto.append(f"[Nível {nivel_hierarquico}]")
+    
+    if caminho_pasta and caminho_pasta != "/":
+        contexto.append(f"[Caminho: {caminho_pasta}]")
+    
+    if contexto:
+        texto = " ".join(contexto) + "\n\n" + texto
+    
+    return texto
+
+# Extrator de cada extensão de arquivo conhecida
+_EXTRATORES_POR_EXTENSAO = {
+    **dict.fromkeys(
+        ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'), extrair_texto_de_imagem
+    ),
+    '.pdf': extrair_texto_de_pdf,
+    **dict.fromkeys(('.txt', '.csv', '.md', '.html', '.xml'), _extrair_texto_simples),
+}
+
+# Extrator de cada tipo MIME (completo ou apenas o tipo principal)
+_EXTRATORES_POR_MIME = {
+    'image': extrair_texto_de_imagem,
+    'application/pdf': extrair_texto_de_pdf,
+    'application/x-pdf': extrair_texto_de_pdf,
+    'text': _extrair_texto_simples,
+}
+
 def extrair_texto_de_arquivo(
     caminho_ou_conteudo: Union[str, bytes],
     nome_arquivo: Optional[str] = None,
@@ -522,106 +1803,37 @@ def extrair_texto_de_arquivo(
     
     # Tenta detectar o tipo MIME do arquivo
     mime_type = None
-    try:
-        import magic
-        if isinstance(caminho_ou_conteudo, bytes):
-            mime_type = magic.from_buffer(caminho_ou_conteudo, mime=True)
-        elif isinstance(caminho_ou_conteudo, str) and os.path.exists(caminho_ou_conteudo):
-            mime_type = magic.from_file(caminho_ou_conteudo, mime=True)
-    except:
-        pass
+    if magic is not None:
+        try:
+            if isinstance(caminho_ou_conteudo, bytes):
+                mime_type = magic.from_buffer(caminho_ou_conteudo, mime=True)
+            elif isinstance(caminho_ou_conteudo, str) and os.path.exists(caminho_ou_conteudo):
+                mime_type = magic.from_file(caminho_ou_conteudo, mime=True)
+        except Exception:
+            pass
     
-    # Processa baseado no tipo MIME ou extensão
+    # Processa baseado no tipo MIME ou, se indisponível, na extensão
     if mime_type:
-        if 'image' in mime_type:
-            return extrair_texto_de_imagem(
-                caminho_ou_conteudo, 
-                idioma=idioma,
-                nivel_hierarquico=nivel_hierarquico,
-                caminho_pasta=caminho_pasta
-            )
-        elif 'pdf' in mime_type:
-            return extrair_texto_de_pdf(
-                caminho_ou_conteudo, 
-                idioma=idioma,
-                nivel_hierarquico=nivel_hierarquico,
-                caminho_pasta=caminho_pasta
-            )
-        elif 'text' in mime_type:
-            # Extrai texto direto
-            if isinstance(caminho_ou_conteudo, str) and os.path.exists(caminho_ou_conteudo):
-                with open(caminho_ou_conteudo, 'r', encoding='utf-8', errors='ignore') as f:
-                    texto = f.read()
-            elif isinstance(caminho_ou_conteudo, bytes):
-                texto = caminho_ou_conteudo.decode('utf-8', errors='ignore')
-            else:
-                return f"[formato de arquivo não suportado]"
-            
-            # Adiciona informações de contexto
-            contexto = []
-            if nivel_hierarquico > 0:
-                contexto.append(f"[Nível {nivel_hierarquico}]")
-            
-            if caminho_pasta and caminho_pasta != "/":
-                contexto.append(f"[Caminho: {caminho_pasta}]")
-            
-            if contexto:
-                texto = " ".join(contexto) + "\n\n" + texto
-            
-            return texto
+        extrator = (
+            _EXTRATORES_POR_MIME.get(mime_type)
+            or _EXTRATORES_POR_MIME.get(mime_type.partition('/')[0])
+        )
     else:
-        # Determina o tipo baseado na extensão
-        if nome.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp')):
-            return extrair_texto_de_imagem(
-                caminho_ou_conteudo, 
-                idioma=idioma,
-                nivel_hierarquico=nivel_hierarquico,
-                caminho_pasta=caminho_pasta
-            )
-        elif nome.endswith('.pdf'):
-            return extrair_texto_de_pdf(
-                caminho_ou_conteudo, 
-                idioma=idioma,
-                nivel_hierarquico=nivel_hierarquico,
-                caminho_pasta=caminho_pasta
-            )
-        elif nome.endswith(('.txt', '.csv', '.md', '.html', '.xml')):
-            # Extrai texto direto
-            if isinstance(caminho_ou_conteudo, str) and os.path.exists(caminho_ou_conteudo):
-                with open(caminho_ou_conteudo, 'r', encoding='utf-8', errors='ignore') as f:
-                    texto = f.read()
-            elif isinstance(caminho_ou_conteudo, bytes):
-                texto = caminho_ou_conteudo.decode('utf-8', errors='ignore')
-            else:
-                return f"[formato de arquivo não suportado]"
-            
-            # Adiciona informações de contexto
-            contexto = []
-            if nivel_hierarquico > 0:
-                contexto.append(f"[Nível {nivel_hierarquico}]")
-            
-            if caminho_pasta and caminho_pasta != "/":
-                contexto.append(f"[Caminho: {caminho_pasta}]")
-            
-            if contexto:
-                texto = " ".join(contexto) + "\n\n" + texto
-            
-            return texto
-        else:
-            # Para arquivos desconhecidos, tenta primeiro como imagem
-            try:
-                return extrair_texto_de_imagem(
-                    caminho_ou_conteudo, 
-                    idioma=idioma,
-                    nivel_hierarquico=nivel_hierarquico,
-                    caminho_pasta=caminho_pasta
-                )
-            except:
-                pass
-            
-            # Se falhar, tenta como PDF
+        extrator = _EXTRATORES_POR_EXTENSAO.get(os.path.splitext(nome)[1])
+    
+    if extrator is not None:
+        return extrator(
+            caminho_ou_conteudo, 
+            idioma=idioma,
+            nivel_hierarquico=nivel_hierarquico,
+            caminho_pasta=caminho_pasta
+        )
+    
+    if not mime_type:
+        # Para arquivos desconhecidos, tenta primeiro como imagem e depois como PDF
+        for extrator in (extrair_texto_de_imagem, extrair_texto_de_pdf):
             try:
-                return extrair_texto_de_pdf(
+                return extrator(
                     caminho_ou_conteudo, 
                     idioma=idioma,
                     nivel_hierarquico=nivel_hierarquico,
@@ -633,10 +1845,14 @@ def extrair_texto_de_arquivo(
     # Se todas as tentativas falharem
     return f"[não foi possível extrair texto do formato: {nome}]"
 
+@st.cache_resource(show_spinner=False)
 def verificar_tesseract() -> Tuple[bool, str]:
     """
     Verifica se o Tesseract OCR está instalado e disponível.
     
+    O resultado fica em cache: o executável só é consultado uma vez por
+    processo, e não a cada execução do script do Streamlit.
+    
     Returns:
         Tupla (instalado, mensagem)
     """
@@ -646,9 +1862,10 @@ def verificar_tesseract() -> Tuple[bool, str]:
     except Exception as e:
         return False, f"Tesseract OCR não encontrado ou não configurado: {str(e)}"
 
+@st.cache_resource(show_spinner=False)
 def listar_idiomas_tesseract() -> List[str]:
     """
-    Lista os idiomas disponíveis no Tesseract OCR.
+    Lista os idiomas disponíveis no Tesseract OCR (em cache, como verificar_tesseract).
     
     Returns:
         Lista de códigos de idiomas instalados
@@ -674,51 +1891,31 @@ def extrair_info_contexto(texto: str) -> Dict[str, Any]:
     menu = ""
     categoria = ""
     
-    # Extrai informações das tags de contexto
-    if "[Nível " in texto:
-        try:
-            nivel_str = texto.split("[Nível ")[1].split("]")[0]
-            nivel = int(nivel_str)
-        except:
-            pass
-    
-    if "[Caminho: " in texto:
-        try:
-            caminho = texto.split("[Caminho: ")[1].split("]")[0]
-        except:
-            pass
-    
-    if "[Tipo: " in texto:
-        try:
-            tipo = texto.split("[Tipo: ")[1].split("]")[0]
-        except:
-            pass
-    
-    if "[Menu: " in texto:
-        try:
-            menu = texto.split("[Menu: ")[1].split("]")[0]
-        except:
-            pass
-    
-    if "[Categoria: " in texto:
-        try:
-            categoria = texto.split("[Categoria: ")[1].split("]")[0]
-        except:
-            pass
-    
-    # Extrai palavras-chave relevantes do texto
-    texto_lower = texto.lower()
-    palavras_chave = []
-    
-    termos_importantes = [
-        "comunicado", "guia rápido", "assistência", "seguros", 
-        "atendimento", "procedimento", "telefone", "contato",
-        "reembolso", "fluxo", "busca", "cliente"
-    ]
+    # Extrai informações das tags de contexto (vale a primeira de cada tipo)
+    vistas = set()
+    for tag, dois_pontos, valor in _TAG_CONTEXTO_RE.findall(texto):
+        # "[Nível N]" não tem dois-pontos; as demais tags têm
+        if tag in vistas or (tag == "Nível") == bool(dois_pontos):
+            continue
+        vistas.add(tag)
+        
+        if tag == "Nível":
+            try:
+                nivel = int(valor)
+            except ValueError:
+                pass
+        elif tag == "Caminho":
+            caminho = valor
+        elif tag == "Tipo":
+            tipo = valor
+        elif tag == "Menu":
+            menu = valor
+        else:
+            categoria = valor
     
-    for termo in termos_importantes:
-        if termo in texto_lower:
-            palavras_chave.append(termo)
+    # Extrai palavras-chave relevantes do texto (sem criar uma cópia em minúsculas)
+    encontrados = {termo.lower() for termo in _TERMOS_IMPORTANTES_RE.findall(texto)}
+    palavras_chave = [termo for termo in TERMOS_IMPORTANTES if termo in encontrados]
     
     return {
         "nivel": nivel,
@@ -0,0 +1,236 @@
+"""
+Módulo de pipeline de indexação de imagens.
+Sobrepõe o OCR e a geração de embeddings: os embeddings começam a ser
+gerados assim que os primeiros textos ficam prontos.
+"""
+
+import os
+import queue
+import asyncio
+import tempfile
+import threading
+import itertools
+from concurrent.futures import FIRST_COMPLETED, wait
+import numpy as np
+import streamlit as st
+from PIL import Image
+from typing import List, Optional, Union, Tuple
+
+from .ocr import (
+    CONFIG_TESSERACT_PADRAO,
+    _obter_executor_ocr,
+    _ocr_grupo,
+    extrair_texto_de_imagens,
+)
+from .embeddings import (
+    EmbeddingsManager,
+    MAX_REQUISICOES_SIMULTANEAS,
+    MAX_TEXTOS_POR_REQUISICAO,
+)
+
+# Número de imagens processadas por cada chamada ao Tesseract
+TAMANHO_GRUPO_OCR = 8
+
+# Capacidade da fila entre o OCR e os embeddings (em grupos de imagens)
+TAMANHO_FILA = 64
+
+# Tempo máximo (em segundos) que um lote incompleto espera por mais textos
+ESPERA_MAXIMA_LOTE = 0.1
+
+def _produzir_textos(
+    imagens: List[Union[str, bytes, Image.Image]],
+    fila: "queue.Queue",
+    idioma: str,
+    pre_processamento: bool,
+    config_tesseract: str,
+    max_workers: int,
+    temp_dir: str
+) -> None:
+    """
+    Executa o OCR das imagens em paralelo e coloca os resultados na fila.
+
+    Cada item da fila é uma tupla (índices, textos, erro). Ao final, um
+    None sinaliza que não há mais textos. Não chama o Streamlit, pois
+    roda fora da thread do script.
+
+    Args:
+        imagens: Lista de caminhos, bytes ou objetos PIL Image
+        fila: Fila compartilhada com o consumidor
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        max_workers: Número máximo de grupos de imagens em processamento ao
+            mesmo tempo no executor compartilhado do OCR
+        temp_dir: Pasta para as imagens temporárias
+    """
+    def processar(indices: List[int]) -> None:
+        try:
+            textos = _ocr_grupo(
+                imagens, indices, idioma, pre_processamento, config_tesseract, temp_dir
+            )
+            fila.put((indices, textos, None))
+        except Exception as e:
+            fila.put((indices, [f"[erro ao processar imagem: {str(e)}]"] * len(indices), str(e)))
+
+    grupos = [
+        list(range(i, min(i + TAMANHO_GRUPO_OCR, len(imagens))))
+        for i in range(0, len(imagens), TAMANHO_GRUPO_OCR)
+    ]
+    # Usa o executor compartilhado do OCR (que não é encerrado), para que as
+    # threads reaproveitem as suas instâncias do tesserocr entre as chamadas;
+    # no máximo max_workers grupos ficam em processamento ao mesmo tempo
+    executor = _obter_executor_ocr()
+    pendentes = iter(grupos)
+    try:
+        em_andamento = {
+            executor.submit(processar, grupo)
+            for grupo in itertools.islice(pendentes, max_workers)
+        }
+        while em_andamento:
+            concluidos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for grupo in itertools.islice(pendentes, len(concluidos)):
+                em_andamento.add(executor.submit(processar, grupo))
+    finally:
+        fila.put(None)
+
+async def _consumir_textos(
+    fila: "queue.Queue",
+    gerenciador: EmbeddingsManager,
+    textos: List[str],
+    embeddings: List[Optional[np.ndarray]]
+) -> None:
+    """
+    Consome os textos da fila e os envia à API de embeddings em lotes.
+
+    Um lote é enviado quando junta MAX_TEXTOS_POR_REQUISICAO textos ou
+    quando o primeiro texto do lote espera mais que ESPERA_MAXIMA_LOTE.
+
+    Args:
+        fila: Fila preenchida pelo OCR
+        gerenciador: Gerenciador de embeddings
+        textos: Lista a preencher com o texto de cada imagem
+        embeddings: Lista a preencher com o embedding de cada imagem
+    """
+    loop = asyncio.get_running_loop()
+    semaforo = asyncio.Semaphore(MAX_REQUISICOES_SIMULTANEAS)
+    client = gerenciador.criar_cliente_async()
+    tarefas = []
+    lote: List[int] = []
+    prazo: Optional[float] = None
+
+    def enviar_lote() -> None:
+        indices = list(lote)
+        tarefa = asyncio.ensure_future(gerenciador.acreate_embeddings_batch(
+            [textos[i] for i in indices], client, semaforo
+        ))
+        tarefas.append((indices, tarefa))
+        lote.clear()
+
+    try:
+        while True:
+            espera = None if prazo is None else max(0.0, prazo - loop.time())
+            try:
+                item = await asyncio.to_thread(fila.get, True, espera)
+            except queue.Empty:
+                # Prazo do lote esgotado: envia o que já foi juntado
+                enviar_lote()
+                prazo = None
+                continue
+
+            if item is None:
+                break
+
+            indices, textos_grupo, erro = item
+            if erro:
+                st.error(f"Erro ao processar imagens com OCR: {erro}")
+
+            for i, texto in zip(indices, textos_grupo):
+                textos[i] = texto
+                if erro:
+                    continue
+                if not lote:
+                    prazo = loop.time() + ESPERA_MAXIMA_LOTE
+                lote.append(i)
+                if len(lote) >= MAX_TEXTOS_POR_REQUISICAO:
+                    enviar_lote()
+                    prazo = None
+
+        if lote:
+            enviar_lote()
+
+        for indices, tarefa in tarefas:
+            for i, embedding in zip(indices, await tarefa):
+                embeddings[i] = embedding
+    finally:
+        await client.close()
+
+def extrair_textos_e_embeddings(
+    imagens: List[Union[str, bytes, Image.Image]],
+    gerenciador: EmbeddingsManager,
+    idioma: str = "por+eng",
+    pre_processamento: bool = True,
+    config_tesseract: str = CONFIG_TESSERACT_PADRAO,
+    max_workers: Optional[int] = None
+) -> Tuple[List[str], List[Optional[np.ndarray]]]:
+    """
+    Extrai o texto de várias imagens e gera os embeddings de cada texto.
+
+    O OCR roda em threads (uma chamada ao Tesseract por grupo de
+    TAMANHO_GRUPO_OCR imagens) que alimentam uma fila limitada; um event
+    loop consome a fila e envia os textos à API de embeddings em lotes,
+    enquanto o OCR das demais imagens continua. Se já houver um event loop
+    em execução, o OCR e os embeddings são feitos em sequência.
+
+    Args:
+        imagens: Lista de caminhos, bytes ou objetos PIL Image
+        gerenciador: Gerenciador de embeddings
+        idioma: Código do idioma para o Tesseract
+        pre_processamento: Se deve aplicar técnicas de pré-processamento
+        config_tesseract: Configurações adicionais para o Tesseract
+        max_workers: Número máximo de grupos de imagens em OCR ao mesmo
+            tempo (None = número de CPUs)
+
+    Returns:
+        Tupla (textos, embeddings), na mesma ordem das imagens
+    """
+    if not imagens:
+        return [], []
+
+    try:
+        asyncio.get_running_loop()
+        em_loop = True
+    except RuntimeError:
+        em_loop = False
+
+    if em_loop or not gerenciador.client:
+        textos = extrair_texto_de_imagens(
+            imagens, idioma, pre_processamento, config_tesseract, max_workers
+        )
+        return textos, gerenciador.create_embeddings_batch(textos)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(imagens)))
+
+    textos = [""] * len(imagens)
+    embeddings: List[Optional[np.ndarray]] = [None] * len(imagens)
+    fila: "queue.Queue" = queue.Queue(maxsize=TAMANHO_FILA)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        produtor = threading.Thread(
+            target=_produzir_textos,
+            args=(imagens, fila, idioma, pre_processamento, config_tesseract, max_workers, temp_dir),
+            daemon=True
+        )
+        produtor.start()
+        try:
+            asyncio.run(_consumir_textos(fila, gerenciador, textos, embeddings))
+        finally:
+            # Esvazia a fila para que o produtor não fique bloqueado
+            while produtor.is_alive():
+                try:
+                    fila.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    return textos, embeddings
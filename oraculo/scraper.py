@@ -4,15 +4,160 @@ Adaptado para tratar estrutura hierárquica de menus e navegação do Guia Rápi
 """
 
 import os
+import re
+import copy
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import threading
+from collections import Counter, OrderedDict
+from urllib.parse import quote, urlencode
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import streamlit as st
 from typing import List, Dict, Optional, Tuple, Any, Union
 
+# Decodificação de JSON mais rápida (opcional)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configurações da API
 GRAPH_ROOT = "https://graph.microsoft.com/v1.0"
 SITE_ID = "carglassbr.sharepoint.com,7d0ecc3f-b6c8-411d-8ae4-6d5679a38ca8,e53fc2d9-95b5-4675-813d-769b7a737286"
 
+# Sessão HTTP reutilizada entre as chamadas à Graph API (mantém as conexões
+# abertas); repete automaticamente respostas de limite de taxa e falhas do
+# servidor, com espera exponencial ou a indicada no cabeçalho Retry-After.
+# O POST também é repetido: a sessão só o usa no $batch, que contém apenas leituras
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+
+# Espera máxima (em segundos) entre as tentativas de download de um arquivo
+ESPERA_MAXIMA_NOVA_TENTATIVA = 60
+
+# Tempo (em segundos) que bibliotecas, detalhes e pastas ficam em cache
+TTL_CACHE_METADADOS = 300
+
+# Tempo (em segundos) que o conteúdo das pastas percorridas por
+# listar_todos_os_arquivos fica em cache, e número máximo de pastas guardadas
+TTL_CACHE_LISTAGENS = 900
+MAX_LISTAGENS_EM_CACHE = 4096
+
+# Número máximo de pastas listadas em paralelo por listar_todos_os_arquivos
+MAX_LISTAGENS_SIMULTANEAS = 16
+
+# Intervalo mínimo (em segundos) entre atualizações da barra de progresso
+INTERVALO_MINIMO_PROGRESSO = 0.05
+
+# Número máximo de subrequisições por chamada ao $batch da Graph API
+TAMANHO_LOTE_GRAPH = 20
+
+# Número máximo de arquivos baixados em paralelo por baixar_arquivos
+MAX_DOWNLOADS_SIMULTANEOS = 8
+
+# Extensões padrão (em minúsculas) de listar_arquivos e baixar_arquivos
+_EXTENSOES_LISTAGEM = (".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".txt")
+_EXTENSOES_DOWNLOAD = (
+    ".pdf", ".docx", ".pptx", ".xlsx",
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp",
+    ".txt", ".csv", ".html"
+)
+
+# Data no nome de um comunicado (ex.: 15/03 ou 15/03/2024)
+_DATA_COMUNICADO_RE = re.compile(r'\d{1,2}/\d{1,2}(?:/\d{2,4})?')
+
+# Categorias especiais identificadas pelo nome da pasta ou do arquivo: a
+# primeira entrada cujas palavras aparecem todas no nome define a categoria
+_CATEGORIAS_PASTA = (
+    (("guia", "rápido"), "Guia Rápido"),
+    (("comunicado",), "Comunicado"),
+    (("linha", "frente"), "Linha de Frente"),
+    (("assistência",), "Assistência"),
+    (("assistencia",), "Assistência"),
+    (("seguro",), "Seguro"),
+    (("segurador",), "Seguro"),
+)
+_CATEGORIAS_ARQUIVO = (
+    (("guia", "pratico"), "Guia Prático"),
+    (("comunicado",), "Comunicado"),
+)
+
+# Tamanho dos blocos gravados em disco durante um download (1 MiB)
+TAMANHO_BLOCO_DOWNLOAD = 1 << 20
+
+# Arquivo com o último cursor (@odata.deltaLink) de cada biblioteca, usado
+# por listar_alteracoes
+CAMINHO_CURSORES_DELTA = ".delta_cursor.json"
+
+# Caracteres trocados por "_" nos nomes dos arquivos baixados
+_SANITIZAR_NOME = str.maketrans({'/': '_', '\\': '_', ':': '_'})
+
+# Tipo de arquivo por extensão (em minúsculas); as demais são "outro"
+_EXT2TIPO = {
+    '.png': "imagem", '.jpg': "imagem", '.jpeg': "imagem", '.gif': "imagem", '.bmp': "imagem",
+    '.pdf': "pdf",
+    '.txt': "texto", '.csv': "texto",
+}
+
+# Parâmetros da listagem do conteúdo de uma pasta (apenas os campos usados
+# pelo aplicativo, sem ordenação no servidor)
+_PARAMS_LISTAGEM = {
+    "$top": 999,  # Número máximo de itens por página
+    "$select": "id,name,folder,file,size,webUrl,parentReference,@microsoft.graph.downloadUrl"
+}
+
+def _ler_json(response: requests.Response) -> Any:
+    """
+    Decodifica o corpo JSON de uma resposta, com o orjson se disponível.
+    
+    Args:
+        response: Resposta HTTP da Graph API
+    
+    Returns:
+        Objeto decodificado
+    
+    Raises:
+        requests.exceptions.JSONDecodeError: Se o corpo não for um JSON válido
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass  # Repete com o requests, que levanta a exceção usual
+    return response.json()
+
+@st.cache_data(ttl=TTL_CACHE_METADADOS, show_spinner=False)
+def _listar_bibliotecas_em_cache(_token: str) -> List[Dict[str, Any]]:
+    """
+    Lista as bibliotecas do site; o resultado fica em cache por TTL_CACHE_METADADOS.
+    
+    O token não entra na chave do cache: todas as sessões usam a mesma
+    credencial do aplicativo. Erros são levantados, para não ficarem em cache.
+    
+    Raises:
+        requests.exceptions.RequestException: Em caso de falha na chamada
+    """
+    headers = {"Authorization": f"Bearer {_token}"}
+    url = f"{GRAPH_ROOT}/sites/{SITE_ID}/drives"
+    
+    response = _SESSION.get(url, headers=headers, timeout=30)
+    response.raise_for_status()  # Levanta exceção para códigos de erro HTTP
+    return _ler_json(response).get("value", [])
+
 def listar_bibliotecas(token: str) -> List[Dict[str, Any]]:
     """
     Lista todas as bibliotecas de documentos do SharePoint.
@@ -23,19 +168,50 @@ def listar_bibliotecas(token: str) -> List[Dict[str, Any]]:
     Returns:
         Lista de dicionários com informações das bibliotecas
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"{GRAPH_ROOT}/sites/{SITE_ID}/drives"
-    
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()  # Levanta exceção para códigos de erro HTTP
-        return response.json().get("value", [])
+        return _listar_bibliotecas_em_cache(_token=token)
     except requests.exceptions.RequestException as e:
         st.error(f"❌ Erro ao listar bibliotecas: {str(e)}")
         if hasattr(e, 'response') and e.response:
             st.code(e.response.text)
         return []
 
+@st.cache_data(ttl=TTL_CACHE_METADADOS, show_spinner=False)
+def _listar_pastas_em_cache(drive_id: str, folder_path: str, _token: str) -> List[Dict[str, Any]]:
+    """
+    Lista as pastas de um caminho; o resultado fica em cache por TTL_CACHE_METADADOS.
+    
+    O token não entra na chave do cache. Erros são levantados, para não
+    ficarem em cache.
+    
+    Raises:
+        requests.exceptions.RequestException: Em caso de falha na chamada
+    """
+    headers = {"Authorization": f"Bearer {_token}"}
+    
+    # Determine a URL correta com base no caminho da pasta
+    if folder_path == "/":
+        url = f"{GRAPH_ROOT}/drives/{drive_id}/root/children"
+    else:
+        url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{folder_path}:/children"
+    
+    response = _SESSION.get(url, headers=headers, params=_PARAMS_LISTAGEM, timeout=30)
+    response.raise_for_status()
+    
+    # Filtra apenas itens que são pastas
+    items = _ler_json(response).get("value", [])
+    folders = []
+    
+    for item in items:
+        if item.get("folder"):
+            # Adiciona informação de nível hierárquico à pasta
+            nivel = folder_path.count('/') + 1
+            item['_nivel_hierarquico'] = nivel
+            item['_caminho_pasta'] = folder_path
+            folders.append(item)
+    
+    return folders
+
 def listar_pastas(token: str, drive_id: str, folder_path: str = "/") -> List[Dict[str, Any]]:
     """
     Lista apenas as pastas em um caminho específico.
@@ -44,39 +220,16 @@ def listar_pastas(token: str, drive_id: str, folder_path: str = "/") -> List[Dic
         token: Token de autenticação
         drive_id: ID da biblioteca do SharePoint
         folder_path: Caminho relativo da pasta
-        
+    
     Returns:
         Lista de pastas no caminho especificado
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    # Determine a URL correta com base no caminho da pasta
-    if folder_path == "/":
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root/children"
-    else:
-        # Certifique-se de que o caminho da pasta não comece com '/'
-        if folder_path.startswith("/"):
-            folder_path = folder_path[1:]
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{folder_path}:/children"
+    # Certifique-se de que o caminho da pasta não comece com '/'
+    if folder_path != "/" and folder_path.startswith("/"):
+        folder_path = folder_path[1:]
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Filtra apenas itens que são pastas
-        items = response.json().get("value", [])
-        folders = []
-        
-        for item in items:
-            if item.get("folder"):
-                # Adiciona informação de nível hierárquico à pasta
-                nivel = folder_path.count('/') + 1
-                item['_nivel_hierarquico'] = nivel
-                item['_caminho_pasta'] = folder_path
-                folders.append(item)
-        
-        return folders
-        
+        return _listar_pastas_em_cache(drive_id, folder_path, _token=token)
     except requests.exceptions.RequestException as e:
         st.warning(f"Erro ao listar pastas em {folder_path}: {str(e)}")
         return []
@@ -96,9 +249,11 @@ def listar_arquivos(token: str, drive_id: str, folder_path: str = "/", extensoes
     """
     headers = {"Authorization": f"Bearer {token}"}
     
-    # Define extensões válidas padrão se não fornecidas
+    # Define extensões válidas padrão se não fornecidas (tupla em minúsculas)
     if extensoes_validas is None:
-        extensoes_validas = [".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".txt"]
+        extensoes = _EXTENSOES_LISTAGEM
+    else:
+        extensoes = tuple(ext.lower() for ext in extensoes_validas)
     
     # Determine a URL correta com base no caminho da pasta
     if folder_path == "/":
@@ -110,11 +265,11 @@ def listar_arquivos(token: str, drive_id: str, folder_path: str = "/", extensoes
         url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{folder_path}:/children"
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = _SESSION.get(url, headers=headers, params=_PARAMS_LISTAGEM, timeout=30)
         response.raise_for_status()
         
         # Filtra apenas itens que NÃO são pastas e têm extensões válidas
-        items = response.json().get("value", [])
+        items = _ler_json(response).get("value", [])
         files = []
         
         for item in items:
@@ -126,7 +281,7 @@ def listar_arquivos(token: str, drive_id: str, folder_path: str = "/", extensoes
                 
                 # Filtra por extensão, se especificado
                 nome = item.get("name", "").lower()
-                if any(nome.endswith(ext.lower()) for ext in extensoes_validas):
+                if nome.endswith(extensoes):
                     # Tenta identificar categoria com base no caminho/nome
                     if "guia_rapido" in folder_path.lower() or "guia rápido" in folder_path.lower():
                         item['_categoria'] = "Guia Rápido"
@@ -141,6 +296,279 @@ def listar_arquivos(token: str, drive_id: str, folder_path: str = "/", extensoes
         st.warning(f"Erro ao listar arquivos em {folder_path}: {str(e)}")
         return []
 
+# Conteúdo das pastas já listadas, compartilhado entre as sessões:
+# (drive_id, caminho) -> (instante, conteúdo), da menos para a mais usada
+_CACHE_LISTAGENS: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_CACHE_LISTAGENS_LOCK = threading.Lock()
+
+def _obter_listagem_em_cache(drive_id: str, caminho_pasta: str) -> Optional[Dict[str, Any]]:
+    """
+    Busca no cache o conteúdo de uma pasta listada há menos de TTL_CACHE_LISTAGENS.
+    
+    Args:
+        drive_id: ID da biblioteca
+        caminho_pasta: Caminho normalizado da pasta
+    
+    Returns:
+        Cópia do conteúdo da pasta, ou None se não estiver em cache
+    """
+    chave = (drive_id, caminho_pasta)
+    with _CACHE_LISTAGENS_LOCK:
+        entrada = _CACHE_LISTAGENS.get(chave)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada[0] > TTL_CACHE_LISTAGENS:
+            del _CACHE_LISTAGENS[chave]
+            return None
+        _CACHE_LISTAGENS.move_to_end(chave)
+    
+    # Os itens são anotados por quem percorre a árvore: cada busca recebe uma cópia
+    return copy.deepcopy(entrada[1])
+
+def _guardar_listagem_em_cache(drive_id: str, caminho_pasta: str, dados: Dict[str, Any]) -> None:
+    """
+    Guarda no cache o conteúdo de uma pasta, descartando as menos usadas
+    além de MAX_LISTAGENS_EM_CACHE.
+    
+    Pastas com mais de uma página não são guardadas, pois os links das
+    páginas seguintes (@odata.nextLink) expiram.
+    
+    Args:
+        drive_id: ID da biblioteca
+        caminho_pasta: Caminho normalizado da pasta
+        dados: Primeira página do conteúdo da pasta
+    """
+    if dados.get("@odata.nextLink"):
+        return
+    
+    chave = (drive_id, caminho_pasta)
+    entrada = (time.monotonic(), copy.deepcopy(dados))
+    with _CACHE_LISTAGENS_LOCK:
+        _CACHE_LISTAGENS[chave] = entrada
+        _CACHE_LISTAGENS.move_to_end(chave)
+        while len(_CACHE_LISTAGENS) > MAX_LISTAGENS_EM_CACHE:
+            _CACHE_LISTAGENS.popitem(last=False)
+
+def _classificar(nome: str, categorias: Tuple[Tuple[Tuple[str, ...], str], ...]) -> Optional[str]:
+    """
+    Identifica a categoria especial de uma pasta ou arquivo pelo nome.
+    
+    Args:
+        nome: Nome em minúsculas
+        categorias: Tabela de (palavras, categoria)
+    
+    Returns:
+        Categoria da primeira entrada cujas palavras estão todas no nome, ou None
+    """
+    for palavras, categoria in categorias:
+        if all(palavra in nome for palavra in palavras):
+            return categoria
+    return None
+
+def _anotar_arquivo(item: Dict[str, Any], nome_arquivo: str, nivel: int, caminho_pasta: str) -> None:
+    """
+    Adiciona a um arquivo as informações de contexto hierárquico e a sua
+    categoria especial (com a data, no caso de comunicados).
+    
+    Args:
+        item: Dicionário do arquivo retornado pela Graph API
+        nome_arquivo: Nome do arquivo em minúsculas
+        nivel: Nível hierárquico da pasta do arquivo
+        caminho_pasta: Caminho da pasta do arquivo
+    """
+    item['_nivel_hierarquico'] = nivel
+    item['_caminho_pasta'] = caminho_pasta
+    
+    # Tenta identificar categorias especiais baseadas no nome
+    categoria = _classificar(nome_arquivo, _CATEGORIAS_ARQUIVO)
+    if categoria:
+        item['_categoria'] = categoria
+        
+        if categoria == "Comunicado":
+            # Extrai data do comunicado, se presente
+            datas = _DATA_COMUNICADO_RE.findall(nome_arquivo)
+            if datas:
+                item['_data_comunicado'] = datas[0]
+
+def _tipo_arquivo(nome: str) -> str:
+    """
+    Identifica o tipo de um arquivo pela extensão.
+    
+    Args:
+        nome: Nome do arquivo
+    
+    Returns:
+        "imagem", "pdf", "texto" ou "outro"
+    """
+    return _EXT2TIPO.get(os.path.splitext(nome)[1].lower(), "outro")
+
+def _normalizar_caminho(caminho_pasta: str) -> str:
+    """
+    Normaliza o caminho de uma pasta (sem barras duplas nem barra inicial).
+    
+    Args:
+        caminho_pasta: Caminho da pasta
+        
+    Returns:
+        Caminho normalizado ("/" para a raiz)
+    """
+    if caminho_pasta == "/":
+        return caminho_pasta
+    caminho_pasta = caminho_pasta.replace("//", "/")
+    if caminho_pasta.startswith("/"):
+        caminho_pasta = caminho_pasta[1:]
+    return caminho_pasta
+
+class _ListagemAntecipada:
+    """
+    Lista as pastas de uma biblioteca em paralelo.
+    
+    Assim que o conteúdo de uma pasta chega, as suas subpastas são agendadas
+    no executor, em lotes de até TAMANHO_LOTE_GRAPH pastas por chamada ao
+    $batch da Graph API; quem percorre a árvore apenas aguarda o resultado
+    de cada pasta, na ordem que quiser. As páginas seguintes de uma
+    listagem (@odata.nextLink) também são buscadas assim que cada página
+    chega, enquanto a anterior é processada.
+    """
+    
+    def __init__(self, token: str, drive_id: str, executor: ThreadPoolExecutor):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.drive_id = drive_id
+        self.executor = executor
+        self.futuros: Dict[str, Future] = {}
+        self.paginas: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+    
+    def agendar(self, caminhos: List[str]) -> None:
+        """Agenda (uma única vez) a listagem de pastas já normalizadas."""
+        with self.lock:
+            novos = [c for c in dict.fromkeys(caminhos) if c not in self.futuros]
+            for caminho in novos:
+                self.futuros[caminho] = Future()
+        
+        for k in range(0, len(novos), TAMANHO_LOTE_GRAPH):
+            self.executor.submit(self._listar_lote, novos[k:k + TAMANHO_LOTE_GRAPH])
+    
+    def obter(self, caminho_pasta: str) -> Dict[str, Any]:
+        """Aguarda e retorna a primeira página do conteúdo de uma pasta."""
+        self.agendar([caminho_pasta])
+        return self.futuros[caminho_pasta].result()
+    
+    def obter_pagina(self, url: str) -> Dict[str, Any]:
+        """Aguarda e retorna uma página seguinte (@odata.nextLink) de uma listagem."""
+        with self.lock:
+            futuro = self.paginas.get(url)
+            if futuro is None:
+                futuro = self.executor.submit(self._buscar_pagina, url)
+                self.paginas[url] = futuro
+        return futuro.result()
+    
+    def _antecipar_pagina(self, dados: Dict[str, Any]) -> None:
+        proxima = dados.get("@odata.nextLink")
+        if not proxima:
+            return
+        with self.lock:
+            if proxima in self.paginas:
+                return
+            try:
+                self.paginas[proxima] = self.executor.submit(self._buscar_pagina, proxima)
+            except RuntimeError:
+                pass  # Executor já encerrado: a busca terminou
+    
+    def _buscar_pagina(self, url: str) -> Dict[str, Any]:
+        response = _SESSION.get(url, headers=self.headers, timeout=30)
+        response.raise_for_status()
+        dados = _ler_json(response)
+        self._antecipar_pagina(dados)
+        return dados
+    
+    def _url_relativa(self, caminho_pasta: str) -> str:
+        if caminho_pasta == "/":
+            return f"/drives/{self.drive_id}/root/children"
+        return f"/drives/{self.drive_id}/root:/{caminho_pasta}:/children"
+    
+    def _listar_pasta(self, caminho_pasta: str) -> Dict[str, Any]:
+        url = GRAPH_ROOT + self._url_relativa(caminho_pasta)
+        response = _SESSION.get(url, headers=self.headers, params=_PARAMS_LISTAGEM, timeout=30)
+        response.raise_for_status()
+        return _ler_json(response)
+    
+    def _listar_em_lote(self, caminhos: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        consulta = "?" + urlencode(_PARAMS_LISTAGEM, safe="$,@", quote_via=quote)
+        corpo = {"requests": [
+            {"id": str(k), "method": "GET", "url": quote(self._url_relativa(c), safe="/:") + consulta}
+            for k, c in enumerate(caminhos)
+        ]}
+        
+        try:
+            response = _SESSION.post(f"{GRAPH_ROOT}/$batch", headers=self.headers, json=corpo, timeout=60)
+            response.raise_for_status()
+            respostas = {r.get("id"): r for r in _ler_json(response).get("responses", [])}
+        except requests.exceptions.RequestException:
+            respostas = {}
+        
+        resultados = []
+        for k, caminho in enumerate(caminhos):
+            resposta = respostas.get(str(k))
+            if resposta is not None and resposta.get("status") == 200:
+                resultados.append(resposta.get("body", {}))
+                continue
+            
+            # Subrequisições com falha (ex.: limite de taxa) são repetidas
+            # individualmente, com as novas tentativas da sessão
+            try:
+                resultados.append(self._listar_pasta(caminho))
+            except requests.exceptions.RequestException as e:
+                resultados.append(e)
+        
+        return resultados
+    
+    def _listar_lote(self, caminhos: List[str]) -> None:
+        # Pastas listadas recentemente vêm do cache; as demais, da Graph API
+        resultados: Dict[str, Union[Dict[str, Any], Exception]] = {}
+        for caminho in caminhos:
+            dados = _obter_listagem_em_cache(self.drive_id, caminho)
+            if dados is not None:
+                resultados[caminho] = dados
+        pendentes = [c for c in caminhos if c not in resultados]
+        
+        try:
+            if len(pendentes) == 1:
+                try:
+                    buscados = [self._listar_pasta(pendentes[0])]
+                except requests.exceptions.RequestException as e:
+                    buscados = [e]
+            elif pendentes:
+                buscados = self._listar_em_lote(pendentes)
+            else:
+                buscados = []
+        except Exception as e:
+            buscados = [e] * len(pendentes)
+        
+        for caminho, dados in zip(pendentes, buscados):
+            if not isinstance(dados, Exception):
+                _guardar_listagem_em_cache(self.drive_id, caminho, dados)
+            resultados[caminho] = dados
+        
+        for caminho in caminhos:
+            dados = resultados[caminho]
+            futuro = self.futuros[caminho]
+            if isinstance(dados, Exception):
+                futuro.set_exception(dados)
+                continue
+            
+            # Antecipa a listagem das subpastas antes de liberar a pasta
+            subpastas = [
+                _normalizar_caminho(f"{caminho}/{item['name']}")
+                for item in dados.get("value", []) if item.get("folder")
+            ]
+            try:
+                self.agendar(subpastas)
+            except RuntimeError:
+                pass  # Executor já encerrado: a busca terminou
+            self._antecipar_pagina(dados)
+            futuro.set_result(dados)
+
 def listar_todos_os_arquivos(
     token: str, 
     drive_id: str, 
@@ -157,6 +585,10 @@ def listar_todos_os_arquivos(
     Lista todos os arquivos recursivamente, incluindo em subpastas.
     Adaptado para estrutura hierárquica.
     
+    As pastas são listadas em paralelo (até MAX_LISTAGENS_SIMULTANEAS
+    requisições simultâneas), mas os arquivos são retornados na mesma
+    ordem de um percurso sequencial da árvore.
+    
     Args:
         token: Token de autenticação
         drive_id: ID da biblioteca
@@ -172,30 +604,49 @@ def listar_todos_os_arquivos(
     Returns:
         Lista de arquivos encontrados
     """
-    headers = {"Authorization": f"Bearer {token}"}
+    executor = ThreadPoolExecutor(max_workers=MAX_LISTAGENS_SIMULTANEAS)
+    try:
+        return _listar_todos_os_arquivos(
+            _ListagemAntecipada(token, drive_id, executor),
+            token, caminho_pasta, progress_bar, progress_start, progress_end,
+            nivel_atual, limite,
+            tuple(ext.lower() for ext in filtrar_extensoes) if filtrar_extensoes else None,
+            exibir_progresso
+        )
+    finally:
+        # Descarta as listagens antecipadas que não foram usadas (ex.: limite atingido)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _listar_todos_os_arquivos(
+    listagem: _ListagemAntecipada,
+    token: str,
+    caminho_pasta: str,
+    progress_bar: Optional[Any],
+    progress_start: float,
+    progress_end: float,
+    nivel_atual: int,
+    limite: Optional[int],
+    filtrar_extensoes: Optional[Tuple[str, ...]],
+    exibir_progresso: bool
+) -> List[Dict[str, Any]]:
+    """
+    Percorre recursivamente as pastas já agendadas em `listagem`.
     
-    # Normaliza o caminho da pasta
-    if caminho_pasta == "/":
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root/children"
-    else:
-        # Remove barras duplas e garante formato correto
-        caminho_pasta = caminho_pasta.replace("//", "/")
-        if caminho_pasta.startswith("/"):
-            caminho_pasta = caminho_pasta[1:]
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{caminho_pasta}:/children"
+    Chamado apenas na thread do script, pois atualiza a barra de progresso.
+    Os demais argumentos são os de listar_todos_os_arquivos, exceto
+    `filtrar_extensoes`, que chega como tupla em minúsculas.
+    
+    Returns:
+        Lista de arquivos encontrados
+    """
+    caminho_pasta = _normalizar_caminho(caminho_pasta)
     
     arquivos = []
     try:
-        # Adiciona parâmetro de paginação e ordenação
-        params = {
-            "$top": 1000,  # Número máximo de itens por página
-            "$orderby": "name asc"
-        }
+        # Primeira página da pasta (listada em paralelo pela listagem antecipada)
+        dados = listagem.obter(caminho_pasta)
         
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        
-        itens = response.json().get("value", [])
+        itens = dados.get("value", [])
         total_itens = len(itens)
         
         # Atualiza o status na barra de progresso
@@ -204,6 +655,7 @@ def listar_todos_os_arquivos(
                 progress_start + 0.1 * (progress_end - progress_start),
                 text=f"Encontrados {total_itens} itens em {caminho_pasta or '/'}"
             )
+        ultima_atualizacao = time.monotonic()
         
         # Processa cada item (arquivo ou pasta)
         for i, item in enumerate(itens):
@@ -211,13 +663,17 @@ def listar_todos_os_arquivos(
             if limite and len(arquivos) >= limite:
                 break
             
-            # Calcula o progresso atual
+            # Calcula o progresso atual (no máximo uma atualização a cada
+            # INTERVALO_MINIMO_PROGRESSO, além da do último item)
             if progress_bar and exibir_progresso and nivel_atual == 0:
-                current_progress = progress_start + (progress_end - progress_start) * (i / total_itens)
-                progress_bar.progress(
-                    min(current_progress, progress_end),
-                    text=f"Processando {i+1}/{total_itens} em {caminho_pasta or '/'}"
-                )
+                agora = time.monotonic()
+                if agora - ultima_atualizacao >= INTERVALO_MINIMO_PROGRESSO or i == total_itens - 1:
+                    ultima_atualizacao = agora
+                    current_progress = progress_start + (progress_end - progress_start) * (i / total_itens)
+                    progress_bar.progress(
+                        min(current_progress, progress_end),
+                        text=f"Processando {i+1}/{total_itens} em {caminho_pasta or '/'}"
+                    )
             
             # Se for uma pasta, busca recursivamente
             if item.get("folder"):
@@ -236,30 +692,21 @@ def listar_todos_os_arquivos(
                     sub_end = progress_end
                 
                 # Chamada recursiva para listar arquivos na subpasta
-                sub_arquivos = listar_todos_os_arquivos(
-                    token, drive_id, nova_pasta, 
+                sub_arquivos = _listar_todos_os_arquivos(
+                    listagem, token, nova_pasta, 
                     progress_bar, sub_start, sub_end,
                     nivel_atual + 1, limite, filtrar_extensoes,
                     exibir_progresso
                 )
                 
-                # Anexa informações de contexto sobre a estrutura de navegação
+                # Anexa informações de contexto sobre a estrutura de navegação,
+                # com a categoria especial da pasta (identificada uma única vez)
+                categoria_pasta = _classificar(item['name'].lower(), _CATEGORIAS_PASTA)
                 for arq in sub_arquivos:
                     arq['_pasta_pai'] = item['name']
-                    
-                    # Tenta identificar categorias especiais
-                    nome_pasta = item['name'].lower()
-                    if "guia" in nome_pasta and "rápido" in nome_pasta:
-                        arq['_categoria'] = "Guia Rápido"
-                    elif "comunicado" in nome_pasta:
-                        arq['_categoria'] = "Comunicado"
-                    elif "linha" in nome_pasta and "frente" in nome_pasta:
-                        arq['_categoria'] = "Linha de Frente"
-                    elif "assistência" in nome_pasta or "assistencia" in nome_pasta:
-                        arq['_categoria'] = "Assistência"
-                    elif "seguro" in nome_pasta or "segurador" in nome_pasta:
-                        arq['_categoria'] = "Seguro"
-                
+                    if categoria_pasta:
+                        arq['_categoria'] = categoria_pasta
+
                 arquivos.extend(sub_arquivos)
                 
                 # Verifica novamente o limite após adicionar os arquivos da subpasta
@@ -267,69 +714,27 @@ def listar_todos_os_arquivos(
                     break
             else:
                 # Se for um arquivo, adiciona à lista se passar pelo filtro
+                # de extensão (quando fornecido)
                 nome_arquivo = item.get("name", "").lower()
+                if filtrar_extensoes and not nome_arquivo.endswith(filtrar_extensoes):
+                    continue
                 
-                # Aplica filtro de extensão se fornecido
-                if filtrar_extensoes:
-                    if any(nome_arquivo.endswith(ext.lower()) for ext in filtrar_extensoes):
-                        # Adiciona informações de contexto hierárquico
-                        item['_nivel_hierarquico'] = nivel_atual
-                        item['_caminho_pasta'] = caminho_pasta
-                        
-                        # Tenta identificar categorias especiais baseadas no nome
-                        if "guia" in nome_arquivo and "pratico" in nome_arquivo:
-                            item['_categoria'] = "Guia Prático"
-                        elif "comunicado" in nome_arquivo:
-                            item['_categoria'] = "Comunicado"
-                            
-                            # Extrai data do comunicado, se presente
-                            import re
-                            datas = re.findall(r'\d{1,2}/\d{1,2}(?:/\d{2,4})?', nome_arquivo)
-                            if datas:
-                                item['_data_comunicado'] = datas[0]
-                        
-                        arquivos.append(item)
-                else:
-                    # Adiciona informações de contexto hierárquico
-                    item['_nivel_hierarquico'] = nivel_atual
-                    item['_caminho_pasta'] = caminho_pasta
-                    
-                    # Tenta identificar categorias especiais baseadas no nome
-                    if "guia" in nome_arquivo and "pratico" in nome_arquivo:
-                        item['_categoria'] = "Guia Prático"
-                    elif "comunicado" in nome_arquivo:
-                        item['_categoria'] = "Comunicado"
-                        
-                        # Extrai data do comunicado, se presente
-                        import re
-                        datas = re.findall(r'\d{1,2}/\d{1,2}(?:/\d{2,4})?', nome_arquivo)
-                        if datas:
-                            item['_data_comunicado'] = datas[0]
-                    
-                    arquivos.append(item)
+                _anotar_arquivo(item, nome_arquivo, nivel_atual, caminho_pasta)
+                arquivos.append(item)
         
         # Verifica se há mais páginas (paginação)
-        next_link = response.json().get("@odata.nextLink")
+        next_link = dados.get("@odata.nextLink")
         while next_link and (not limite or len(arquivos) < limite):
-            response = requests.get(next_link, headers=headers, timeout=30)
-            response.raise_for_status()
+            # Página já antecipada pela listagem (ou buscada agora)
+            dados = listagem.obter_pagina(next_link)
             
-            itens = response.json().get("value", [])
+            itens = dados.get("value", [])
             for item in itens:
                 if not item.get("folder"):
-                    nome_arquivo = item.get("name", "").lower()
-                    
                     # Aplica filtro de extensão se fornecido
-                    if filtrar_extensoes:
-                        if any(nome_arquivo.endswith(ext.lower()) for ext in filtrar_extensoes):
-                            # Adiciona informações de contexto hierárquico
-                            item['_nivel_hierarquico'] = nivel_atual
-                            item['_caminho_pasta'] = caminho_pasta
-                            arquivos.append(item)
-                    else:
-                        # Adiciona informações de contexto hierárquico
-                        item['_nivel_hierarquico'] = nivel_atual
-                        item['_caminho_pasta'] = caminho_pasta
+                    nome_arquivo = item.get("name", "").lower()
+                    if not filtrar_extensoes or nome_arquivo.endswith(filtrar_extensoes):
+                        _anotar_arquivo(item, nome_arquivo, nivel_atual, caminho_pasta)
                         arquivos.append(item)
                 
                 # Verifica o limite
@@ -337,7 +742,7 @@ def listar_todos_os_arquivos(
                     break
             
             # Obtém o próximo link para paginação
-            next_link = response.json().get("@odata.nextLink")
+            next_link = dados.get("@odata.nextLink")
         
         # Finaliza a barra de progresso
         if progress_bar and exibir_progresso and nivel_atual == 0:
@@ -353,37 +758,136 @@ def listar_todos_os_arquivos(
     
     return arquivos
 
-def baixar_arquivo(
-    token: str, 
-    download_url: str, 
-    nome_arquivo: str, 
-    caminho_pasta: str = "/",
-    pasta_destino: str = "data"
-) -> Tuple[Optional[str], Optional[bytes], Optional[str]]:
+def listar_delta(
+    token: str,
+    drive_id: str,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Baixa um único arquivo do SharePoint.
-    Adaptado para preservar informações de contexto hierárquico.
+    Lista os itens de uma biblioteca alterados desde um cursor, pelo
+    endpoint /delta da Graph API (uma lista plana, sem percorrer as pastas).
+    
+    Sem cursor, retorna todos os itens da biblioteca. Itens removidos vêm
+    com a propriedade "deleted".
     
     Args:
         token: Token de autenticação
-        download_url: URL para download do arquivo
-        nome_arquivo: Nome do arquivo para salvar
-        caminho_pasta: Caminho da pasta SharePoint (para contexto)
-        pasta_destino: Pasta local para salvar o arquivo
+        drive_id: ID da biblioteca
+        cursor: @odata.deltaLink retornado pela chamada anterior
         
     Returns:
-        Tupla contendo (caminho_local, conteúdo_binário, caminho_pasta)
+        Tupla (itens alterados, novo cursor); em caso de erro, os itens
+        obtidos até a falha e o cursor recebido, para repetir a consulta
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    if cursor:
+        url, params = cursor, None
+    else:
+        url = f"{GRAPH_ROOT}/drives/{drive_id}/root/delta"
+        params = {"$select": _PARAMS_LISTAGEM["$select"] + ",deleted"}
+    
+    itens = []
+    try:
+        while url:
+            response = _SESSION.get(url, headers=headers, params=params, timeout=30)
+            if response.status_code == 410 and cursor:
+                # Cursor expirado: a Graph API exige uma nova listagem completa
+                return listar_delta(token, drive_id)
+            response.raise_for_status()
+            
+            dados = _ler_json(response)
+            itens.extend(dados.get("value", []))
+            
+            # As páginas seguintes já trazem os parâmetros na própria URL
+            url, params = dados.get("@odata.nextLink"), None
+            if not url:
+                return itens, dados.get("@odata.deltaLink")
+    except requests.exceptions.RequestException as e:
+        st.warning(f"Erro ao listar alterações da biblioteca: {str(e)}")
+    
+    return itens, cursor
+
+_CURSORES_DELTA_LOCK = threading.Lock()
+
+def listar_alteracoes(token: str, drive_id: str) -> List[Dict[str, Any]]:
+    """
+    Lista os itens de uma biblioteca alterados desde a última chamada.
+    
+    O cursor de cada biblioteca é guardado em CAMINHO_CURSORES_DELTA; na
+    primeira chamada, todos os itens da biblioteca são retornados.
+    
+    Args:
+        token: Token de autenticação
+        drive_id: ID da biblioteca
+        
+    Returns:
+        Lista de itens alterados (os removidos vêm com a propriedade "deleted")
+    """
+    with _CURSORES_DELTA_LOCK:
+        try:
+            with open(CAMINHO_CURSORES_DELTA, "r", encoding="utf-8") as f:
+                cursores = json.load(f)
+        except (OSError, ValueError):
+            cursores = {}
+        
+        itens, cursor = listar_delta(token, drive_id, cursores.get(drive_id))
+        
+        if cursor and cursor != cursores.get(drive_id):
+            cursores[drive_id] = cursor
+            caminho_temporario = f"{CAMINHO_CURSORES_DELTA}.tmp"
+            with open(caminho_temporario, "w", encoding="utf-8") as f:
+                json.dump(cursores, f)
+            os.replace(caminho_temporario, CAMINHO_CURSORES_DELTA)
+    
+    return itens
+
+# Pastas de destino já criadas por este processo
+_PASTAS_CRIADAS = set()
+_PASTAS_CRIADAS_LOCK = threading.Lock()
+
+def _garantir_pasta(pasta: str) -> None:
+    """
+    Cria a pasta de destino, se não existir, uma única vez por processo.
+    
+    Args:
+        pasta: Pasta local para salvar os arquivos
+    """
+    pasta = os.path.abspath(pasta)
+    if pasta in _PASTAS_CRIADAS:
+        return
+    with _PASTAS_CRIADAS_LOCK:
+        os.makedirs(pasta, exist_ok=True)
+        _PASTAS_CRIADAS.add(pasta)
+
+def _baixar_arquivo(
+    token: str,
+    download_url: str,
+    nome_arquivo: str,
+    caminho_pasta: str = "/",
+    pasta_destino: str = "data"
+) -> Tuple[str, None, str]:
+    """
+    Baixa um único arquivo do SharePoint, sem tratar os erros.
+    
+    O conteúdo é gravado em disco em blocos, sem ser mantido em memória.
+    Não chama o Streamlit, para poder rodar fora da thread do script.
+    Os argumentos são os de baixar_arquivo.
+    
+    Returns:
+        Tupla contendo (caminho_local, None, caminho_pasta)
+    
+    Raises:
+        requests.exceptions.RequestException: Em caso de falha no download
     """
     headers = {"Authorization": f"Bearer {token}"}
     
     # Cria a pasta de destino se não existir
-    if not os.path.exists(pasta_destino):
-        os.makedirs(pasta_destino)
+    _garantir_pasta(pasta_destino)
     
     # Constrói o caminho local para o arquivo
     # Preserva a informação de hierarquia no nome do arquivo
-    caminho_seguro = caminho_pasta.replace('/', '_').strip('_')
-    nome_seguro = nome_arquivo.replace(':', '_').replace('/', '_')
+    caminho_seguro = caminho_pasta.translate(_SANITIZAR_NOME).strip('_')
+    nome_seguro = nome_arquivo.translate(_SANITIZAR_NOME)
     
     if caminho_seguro:
         nome_arquivo_final = f"{caminho_seguro}_{nome_seguro}"
@@ -392,22 +896,129 @@ def baixar_arquivo(
     
     caminho_local = os.path.join(pasta_destino, nome_arquivo_final)
     
-    try:
-        # Tenta baixar o arquivo
-        response = requests.get(download_url, headers=headers, timeout=60)
+    # Baixa o arquivo em blocos para um arquivo temporário, que só substitui
+    # o destino quando o download termina (sem arquivos pela metade)
+    caminho_parcial = f"{caminho_local}.part"
+    with _SESSION.get(download_url, headers=headers, stream=True, timeout=(10, 300)) as response:
         response.raise_for_status()
-        conteudo = response.content
-        
-        # Salva o arquivo localmente
-        with open(caminho_local, "wb") as f:
-            f.write(conteudo)
-        
-        return caminho_local, conteudo, caminho_pasta
+        try:
+            with open(caminho_parcial, "wb") as f:
+                for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                    f.write(bloco)
+            os.replace(caminho_parcial, caminho_local)
+        except BaseException:
+            if os.path.exists(caminho_parcial):
+                os.remove(caminho_parcial)
+            raise
+    
+    return caminho_local, None, caminho_pasta
+
+def baixar_arquivo(
+    token: str,
+    download_url: str,
+    nome_arquivo: str,
+    caminho_pasta: str = "/",
+    pasta_destino: str = "data"
+) -> Tuple[Optional[str], Optional[bytes], Optional[str]]:
+    """
+    Baixa um único arquivo do SharePoint.
+    Adaptado para preservar informações de contexto hierárquico.
     
+    Args:
+        token: Token de autenticação
+        download_url: URL para download do arquivo
+        nome_arquivo: Nome do arquivo para salvar
+        caminho_pasta: Caminho da pasta SharePoint (para contexto)
+        pasta_destino: Pasta local para salvar o arquivo
+    
+    Returns:
+        Tupla contendo (caminho_local, None, caminho_pasta); o conteúdo
+        fica apenas em disco, em caminho_local
+    """
+    try:
+        return _baixar_arquivo(token, download_url, nome_arquivo, caminho_pasta, pasta_destino)
     except requests.exceptions.RequestException as e:
         st.warning(f"Erro ao baixar {nome_arquivo}: {str(e)}")
         return None, None, None
 
+def _espera_nova_tentativa(erro: Exception, tentativa: int) -> float:
+    """
+    Calcula a espera antes de repetir um download que falhou.
+    
+    Args:
+        erro: Exceção da tentativa que falhou
+        tentativa: Número da tentativa que falhou (começando em 0)
+    
+    Returns:
+        Segundos indicados pelo cabeçalho Retry-After da resposta, se houver,
+        ou 2 ** tentativa; no máximo ESPERA_MAXIMA_NOVA_TENTATIVA
+    """
+    response = getattr(erro, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), ESPERA_MAXIMA_NOVA_TENTATIVA)
+            except ValueError:
+                pass  # Data HTTP: usa a espera exponencial
+    return min(2 ** tentativa, ESPERA_MAXIMA_NOVA_TENTATIVA)
+
+def _baixar_com_tentativas(
+    token: str,
+    arq: Dict[str, Any],
+    pasta: str,
+    max_tentativas: int
+) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Baixa um arquivo da listagem, tentando novamente em caso de falha.
+    
+    Não chama o Streamlit: os avisos são devolvidos para serem exibidos
+    pela thread do script.
+    
+    Args:
+        token: Token de autenticação
+        arq: Dicionário com as informações do arquivo
+        pasta: Pasta local para salvar o arquivo
+        max_tentativas: Número máximo de tentativas
+    
+    Returns:
+        Tupla (informações do arquivo baixado ou None, avisos)
+    """
+    nome = arq.get("name", "")
+    link = arq.get("@microsoft.graph.downloadUrl")
+    nivel = arq.get("_nivel_hierarquico", 0)
+    caminho = arq.get("_caminho_pasta", "/")
+    categoria = arq.get("_categoria", "")
+    avisos = []
+    
+    for tentativa in range(max_tentativas):
+        try:
+            caminho_local, _, _ = _baixar_arquivo(token, link, nome, caminho, pasta)
+            
+            # Adiciona informações para cada arquivo baixado
+            arquivo_info = {
+                "nome": nome,
+                "caminho_local": caminho_local,
+                "nivel_hierarquico": nivel,
+                "caminho_pasta": caminho,
+                "categoria": categoria,
+                "tipo": _tipo_arquivo(nome)
+            }
+            
+            return arquivo_info, avisos
+        except requests.exceptions.RequestException as e:
+            avisos.append(f"Erro ao baixar {nome}: {str(e)}")
+            erro = e
+        except Exception as e:
+            avisos.append(f"Erro ao baixar {nome} (tentativa {tentativa+1}): {e}")
+            erro = e
+        
+        if tentativa < max_tentativas - 1:
+            # Espera antes de tentar novamente (respeitando o limite de taxa)
+            time.sleep(_espera_nova_tentativa(erro, tentativa))
+    
+    return None, avisos
+
 def baixar_arquivos(
     token: str,
     arquivos: List[Dict[str, Any]],
@@ -431,26 +1042,21 @@ def baixar_arquivos(
     Returns:
         Lista de dicionários com informações dos arquivos baixados
     """
-    # Define extensões padrão se não fornecidas
+    # Define extensões padrão se não fornecidas, garantindo que estejam
+    # em minúsculas
     if extensoes_validas is None:
-        extensoes_validas = [
-            ".pdf", ".docx", ".pptx", ".xlsx", 
-            ".png", ".jpg", ".jpeg", ".gif", ".bmp",
-            ".txt", ".csv", ".html"
-        ]
-    
-    # Garante que as extensões estejam em minúsculas
-    extensoes_validas = [ext.lower() for ext in extensoes_validas]
+        extensoes = _EXTENSOES_DOWNLOAD
+    else:
+        extensoes = tuple(ext.lower() for ext in extensoes_validas)
     
     # Cria a pasta de destino se não existir
-    if not os.path.exists(pasta):
-        os.makedirs(pasta)
+    _garantir_pasta(pasta)
     
     # Filtra arquivos por extensão
     arquivos_para_baixar = []
     for arq in arquivos:
         nome = arq.get("name", "").lower()
-        if any(nome.endswith(ext) for ext in extensoes_validas):
+        if nome.endswith(extensoes):
             arquivos_para_baixar.append(arq)
     
     total_arquivos = len(arquivos_para_baixar)
@@ -462,62 +1068,35 @@ def baixar_arquivos(
     if progress_bar:
         progress_bar.progress(0, text=f"Preparando para baixar {total_arquivos} arquivos...")
     
-    # Lista para armazenar informações dos arquivos baixados
-    arquivos_baixados = []
-    
-    # Download dos arquivos
-    for i, arq in enumerate(arquivos_para_baixar):
-        nome = arq.get("name", "")
-        link = arq.get("@microsoft.graph.downloadUrl")
-        nivel = arq.get("_nivel_hierarquico", 0)
-        caminho = arq.get("_caminho_pasta", "/")
-        categoria = arq.get("_categoria", "")
+    # Download dos arquivos em paralelo; o progresso e os avisos são
+    # atualizados nesta thread, à medida que cada download termina
+    resultados: List[Optional[Dict[str, Any]]] = [None] * total_arquivos
+    ultima_atualizacao = time.monotonic()
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_SIMULTANEOS) as executor:
+        futuros = {
+            executor.submit(_baixar_com_tentativas, token, arq, pasta, max_tentativas): i
+            for i, arq in enumerate(arquivos_para_baixar)
+            if arq.get("@microsoft.graph.downloadUrl")
+        }
         
-        if link:
-            # Atualiza progresso
-            if progress_bar:
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            i = futuros[futuro]
+            resultados[i], avisos = futuro.result()
+            for aviso in avisos:
+                st.warning(aviso)
+            
+            # Atualiza progresso (no máximo uma vez a cada INTERVALO_MINIMO_PROGRESSO)
+            agora = time.monotonic()
+            if progress_bar and agora - ultima_atualizacao >= INTERVALO_MINIMO_PROGRESSO:
+                ultima_atualizacao = agora
                 progress_bar.progress(
-                    min(i / total_arquivos, 0.99),
-                    text=f"Baixando {i+1}/{total_arquivos}: {nome}"
+                    min(concluidos / total_arquivos, 0.99),
+                    text=f"Baixados {concluidos}/{total_arquivos}: {arquivos_para_baixar[i].get('name', '')}"
                 )
-            
-            # Tenta baixar com múltiplas tentativas
-            for tentativa in range(max_tentativas):
-                try:
-                    caminho_local, conteudo_binario, caminho_pasta = baixar_arquivo(
-                        token, link, nome, caminho, pasta
-                    )
-                    
-                    if caminho_local:
-                        # Adiciona informações para cada arquivo baixado
-                        arquivo_info = {
-                            "nome": nome,
-                            "caminho_local": caminho_local,
-                            "nivel_hierarquico": nivel,
-                            "caminho_pasta": caminho,
-                            "categoria": categoria
-                        }
-                        
-                        # Verifica tipo de arquivo
-                        if nome.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                            arquivo_info["tipo"] = "imagem"
-                        elif nome.lower().endswith('.pdf'):
-                            arquivo_info["tipo"] = "pdf"
-                        elif nome.lower().endswith(('.txt', '.csv')):
-                            arquivo_info["tipo"] = "texto"
-                        else:
-                            arquivo_info["tipo"] = "outro"
-                        
-                        arquivos_baixados.append(arquivo_info)
-                        break
-                    elif tentativa < max_tentativas - 1:
-                        # Espera antes de tentar novamente
-                        time.sleep(2)
-                except Exception as e:
-                    st.warning(f"Erro ao baixar {nome} (tentativa {tentativa+1}): {e}")
-                    if tentativa < max_tentativas - 1:
-                        time.sleep(2)
     
+    # Mantém a ordem original dos arquivos
+    arquivos_baixados = [info for info in resultados if info is not None]
+
     # Finaliza progresso
     if progress_bar:
         progress_bar.progress(
@@ -528,6 +1107,24 @@ def baixar_arquivos(
     
     return arquivos_baixados
 
+@st.cache_data(ttl=TTL_CACHE_METADADOS, show_spinner=False)
+def _obter_detalhes_biblioteca_em_cache(drive_id: str, _token: str) -> Dict[str, Any]:
+    """
+    Obtém os detalhes de uma biblioteca; o resultado fica em cache por TTL_CACHE_METADADOS.
+    
+    O token não entra na chave do cache. Erros são levantados, para não
+    ficarem em cache.
+    
+    Raises:
+        requests.exceptions.RequestException: Em caso de falha na chamada
+    """
+    headers = {"Authorization": f"Bearer {_token}"}
+    url = f"{GRAPH_ROOT}/drives/{drive_id}"
+    
+    response = _SESSION.get(url, headers=headers, timeout=30)
+    response.raise_for_status()
+    return _ler_json(response)
+
 def obter_detalhes_biblioteca(token: str, drive_id: str) -> Dict[str, Any]:
     """
     Obtém detalhes adicionais sobre uma biblioteca específica.
@@ -539,17 +1136,23 @@ def obter_detalhes_biblioteca(token: str, drive_id: str) -> Dict[str, Any]:
     Returns:
         Dicionário com detalhes da biblioteca
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"{GRAPH_ROOT}/drives/{drive_id}"
-    
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        return response.json()
+        return _obter_detalhes_biblioteca_em_cache(drive_id, _token=token)
     except requests.exceptions.RequestException as e:
         st.warning(f"Erro ao obter detalhes da biblioteca: {str(e)}")
         return {}
 
+def limpar_cache_metadados() -> None:
+    """
+    Descarta o cache de bibliotecas, detalhes e pastas, para que a próxima
+    chamada busque os dados atualizados no SharePoint.
+    """
+    _listar_bibliotecas_em_cache.clear()
+    _listar_pastas_em_cache.clear()
+    _obter_detalhes_biblioteca_em_cache.clear()
+    with _CACHE_LISTAGENS_LOCK:
+        _CACHE_LISTAGENS.clear()
+
 def verificar_token(token: str) -> bool:
     """
     Verifica se o token é válido fazendo uma chamada simples.
@@ -564,7 +1167,9 @@ def verificar_token(token: str) -> bool:
     url = f"{GRAPH_ROOT}/me"  # Uma chamada simples para verificar o token
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        # Pede apenas o id, para a resposta ser mínima; o corpo ainda é lido,
+        # para a conexão voltar ao pool da sessão
+        response = _SESSION.get(url, headers=headers, params={"$select": "id"}, timeout=10)
         return response.status_code == 200
     except:
         return False
@@ -785,58 +1390,26 @@ def analisar_estrutura_navegacao(arquivos: List[Dict[str, Any]]) -> Dict[str, An
     Returns:
         Dicionário com informações sobre a estrutura hierárquica
     """
-    niveis = {}
-    caminhos = set()
-    categorias = {}
-    tipos_arquivos = {}
+    # Conta arquivos por nível, por categoria e por tipo
+    niveis = Counter(arq.get("_nivel_hierarquico", 0) for arq in arquivos)
+    categorias = Counter(arq.get("_categoria", "Sem categoria") for arq in arquivos)
+    tipos_arquivos = Counter(_tipo_arquivo(arq.get("name", "")) for arq in arquivos)
     
-    for arq in arquivos:
-        # Conta arquivos por nível
-        nivel = arq.get("_nivel_hierarquico", 0)
-        if nivel not in niveis:
-            niveis[nivel] = 0
-        niveis[nivel] += 1
-        
-        # Registra caminhos únicos
-        caminho = arq.get("_caminho_pasta", "/")
-        caminhos.add(caminho)
-        
-        # Conta arquivos por categoria
-        categoria = arq.get("_categoria", "Sem categoria")
-        if categoria not in categorias:
-            categorias[categoria] = 0
-        categorias[categoria] += 1
-        
-        # Conta tipos de arquivo
-        nome = arq.get("name", "").lower()
-        if nome.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-            tipo = "imagem"
-        elif nome.endswith('.pdf'):
-            tipo = "pdf"
-        elif nome.endswith(('.txt', '.csv')):
-            tipo = "texto"
-        else:
-            tipo = "outro"
-            
-        if tipo not in tipos_arquivos:
-            tipos_arquivos[tipo] = 0
-        tipos_arquivos[tipo] += 1
+    # Registra caminhos únicos, na ordem em que aparecem
+    caminhos = dict.fromkeys(arq.get("_caminho_pasta", "/") for arq in arquivos)
     
-    # Cria árvore de navegação
+    # Cria árvore de navegação (as pastas ficam na ordem da listagem)
     arvore = {}
-    for caminho in sorted(caminhos):
-        partes = caminho.strip('/').split('/')
+    for caminho in caminhos:
         nivel_atual = arvore
-        for parte in partes:
+        for parte in caminho.strip('/').split('/'):
             if parte:
-                if parte not in nivel_atual:
-                    nivel_atual[parte] = {}
-                nivel_atual = nivel_atual[parte]
+                nivel_atual = nivel_atual.setdefault(parte, {})
     
     return {
-        "niveis": niveis,
+        "niveis": dict(niveis),
         "caminhos": list(caminhos),
-        "categorias": categorias,
-        "tipos_arquivos": tipos_arquivos,
+        "categorias": dict(categorias),
+        "tipos_arquivos": dict(tipos_arquivos),
         "arvore_navegacao": arvore
     }
@@ -3,15 +3,18 @@ import tempfile
 import platform
 import streamlit as st
 import requests
-import io
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import traceback
 import json
 import time
-from PIL import Image, ImageEnhance, ImageFilter
-import pytesseract
 import numpy as np
 from typing import List, Dict, Optional, Tuple, Any, Union
 
+from oraculo.ocr import verificar_tesseract
+from oraculo.scraper import limpar_cache_metadados
+from oraculo.scraper import listar_todos_os_arquivos as listar_todos_os_arquivos_em_paralelo
+
 # Importações para Selenium
 try:
     from selenium import webdriver
@@ -59,6 +62,15 @@ if pdf_processor is None:
         pdf_processor = None
         st.error("Nenhum processador de PDF disponível. Instale pymupdf ou pdf2image.")
 
+@st.cache_resource(show_spinner=False)
+def verificar_poppler():
+    """Verifica (uma única vez por processo) se o Poppler responde ao pdf2image"""
+    try:
+        pdf2image.pdfinfo_from_bytes(b"%PDF-1.0\n1 0 obj<</Pages 2 0 R>>/endobj/trailer<</Root 1 0 R>>")
+        return True
+    except Exception:
+        return False
+
 # Tenta importar python-magic para detecção de tipos de arquivo
 try:
     import magic
@@ -78,11 +90,36 @@ st.set_page_config(
 GRAPH_ROOT = "https://graph.microsoft.com/v1.0"
 SITE_ID = "carglassbr.sharepoint.com,7d0ecc3f-b6c8-411d-8ae4-6d5679a38ca8,e53fc2d9-95b5-4675-813d-769b7a737286"
 DATA_DIR = "data"
+
+# Sessão HTTP reutilizada entre as chamadas (mantém as conexões TLS abertas);
+# repete respostas de limite de taxa e falhas do servidor, respeitando o
+# cabeçalho Retry-After
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
 SHAREPOINT_URL = "https://carglassbr.sharepoint.com/sites/GuiaRapido"
 
-# Verifica e cria o diretório para armazenar os arquivos, se não existir
-if not os.path.exists(DATA_DIR) :
-    os.makedirs(DATA_DIR)
+# Parâmetros da listagem do conteúdo de uma pasta (apenas os campos usados
+# pelo explorador de estrutura)
+PARAMS_LISTAGEM = {
+    "$top": 999,  # Número máximo de itens por página
+    "$select": "id,name,folder,file,size,webUrl,@microsoft.graph.downloadUrl"
+}
+
+# Caracteres trocados por "_" nos nomes dos arquivos baixados
+SANITIZAR_NOME = str.maketrans({'/': '_', '\\': '_', ':': '_', '?': '_', '*': '_'})
+
+# Cria o diretório para armazenar os arquivos, se não existir
+os.makedirs(DATA_DIR, exist_ok=True)
 
 # Título e descrição
 st.title("🔮 Oráculo - Análise Inteligente de Documentos do SharePoint")
@@ -95,6 +132,7 @@ permite consultas em linguagem natural usando IA.
 if st.button("🧹 Limpar cache e reiniciar"):
     for key in list(st.session_state.keys()):
         del st.session_state[key]
+    limpar_cache_metadados()
     st.rerun()
 
 # Configuração do OCR e caminhos
@@ -148,21 +186,20 @@ with st.sidebar:
     # Verifica o status do sistema
     st.subheader("Status do Sistema")
     
-    # Verifica Tesseract OCR
-    try:
-        tesseract_version = pytesseract.get_tesseract_version()
-        st.success(f"✅ Tesseract OCR v{tesseract_version} instalado")
-    except:
+    # Verifica Tesseract OCR (uma única vez por processo)
+    tesseract_ok, mensagem_tesseract = verificar_tesseract()
+    if tesseract_ok:
+        st.success(f"✅ {mensagem_tesseract}")
+    else:
         st.error("❌ Tesseract OCR não encontrado")
     
     # Verifica processador de PDF
     if pdf_processor == "pymupdf":
         st.success("✅ PyMuPDF está sendo usado para PDFs")
     elif pdf_processor == "pdf2image":
-        try:
-            pdf2image.pdfinfo_from_bytes(b"%PDF-1.0\n1 0 obj<</Pages 2 0 R>>/endobj/trailer<</Root 1 0 R>>")
+        if verificar_poppler():
             st.success("✅ Poppler está instalado corretamente")
-        except Exception as e:
+        else:
             st.error(f"⚠️ Poppler não está configurado corretamente")
     else:
         st.error("❌ Nenhum processador de PDF disponível")
@@ -201,7 +238,7 @@ def get_graph_token():
             "grant_type": "client_credentials"
         }
 
-        response = requests.post(url, headers=headers, data=data, timeout=30) 
+        response = _SESSION.post(url, headers=headers, data=data, timeout=30)
         if response.status_code == 200:
             return response.json().get("access_token")
         else:
@@ -225,7 +262,7 @@ def listar_bibliotecas(token):
     url = f"{GRAPH_ROOT}/sites/{SITE_ID}/drives"
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = _SESSION.get(url, headers=headers, timeout=30)
         if response.status_code == 200:
             return response.json().get("value", [])
         else:
@@ -252,7 +289,7 @@ def listar_pastas(token, drive_id, folder_path="/"):
         url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{folder_path}:/children"
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = _SESSION.get(url, headers=headers, params=PARAMS_LISTAGEM, timeout=30)
         if response.status_code == 200:
             # Filtra apenas itens que são pastas
             items = response.json().get("value", [])
@@ -280,9 +317,11 @@ def listar_arquivos(token, drive_id, folder_path="/", extensoes_validas=None):
     """
     headers = {"Authorization": f"Bearer {token}"}
     
-    # Define extensões válidas padrão se não fornecidas
+    # Define extensões válidas padrão se não fornecidas (tupla em minúsculas,
+    # para um único str.endswith por arquivo)
     if extensoes_validas is None:
         extensoes_validas = [".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".txt"]
+    extensoes = tuple(ext.lower() for ext in extensoes_validas)
     
     # Determine a URL correta com base no caminho da pasta
     if folder_path == "/":
@@ -294,7 +333,7 @@ def listar_arquivos(token, drive_id, folder_path="/", extensoes_validas=None):
         url = f"{GRAPH_ROOT}/drives/{drive_id}/root:/{folder_path}:/children"
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = _SESSION.get(url, headers=headers, params=PARAMS_LISTAGEM, timeout=30)
         if response.status_code == 200:
             # Filtra apenas itens que NÃO são pastas e têm extensões válidas
             items = response.json().get("value", [])
@@ -309,7 +348,7 @@ def listar_arquivos(token, drive_id, folder_path="/", extensoes_validas=None):
                     
                     # Filtra por extensão, se especificado
                     nome = item.get("name", "").lower()
-                    if any(nome.endswith(ext.lower()) for ext in extensoes_validas):
+                    if nome.endswith(extensoes):
                         # Tenta identificar categoria com base no caminho/nome
                         if "guia_rapido" in folder_path.lower() or "guia rápido" in folder_path.lower():
                             item['_categoria'] = "Guia Rápido"
@@ -327,223 +366,58 @@ def listar_arquivos(token, drive_id, folder_path="/", extensoes_validas=None):
         return []
 
 def listar_todos_os_arquivos(token, drive_id, caminho_pasta="/", progress_bar=None, limite=None):
-    """Lista todos os arquivos em uma biblioteca, incluindo subpastas"""
-    headers = {"Authorization": f"Bearer {token}"}
-    if caminho_pasta == "/":
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root/children"
-    else:
-        url = f"{GRAPH_ROOT}/drives/{drive_id}/root:{caminho_pasta}:/children"
-
-    arquivos = []
-    try:
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            itens = response.json().get("value", [])
-            
-            # Atualiza a barra de progresso, se fornecida
-            if progress_bar:
-                progress_bar.progress(0.1, text="Iniciando busca...")
-            
-            for i, item in enumerate(itens):
-                # Aplica o limite, se especificado
-                if limite and len(arquivos) >= limite:
-                    break
-                    
-                if item.get("folder"):
-                    nova_pasta = f"{caminho_pasta}/{item['name']}".replace("//", "/")
-                    # Adiciona nível hierárquico à pasta
-                    nivel = nova_pasta.count('/')
-                    item['_nivel_hierarquico'] = nivel
-                    
-                    sub_arquivos = listar_todos_os_arquivos(token, drive_id, nova_pasta, limite=limite)
-                    arquivos.extend(sub_arquivos)
-                else:
-                    # Adiciona nível hierárquico aos arquivos
-                    nivel = caminho_pasta.count('/')
-                    item['_nivel_hierarquico'] = nivel
-                    item['_caminho_pasta'] = caminho_pasta
-                    arquivos.append(item)
-                
-                # Atualiza a barra de progresso
-                if progress_bar:
-                    progress = min(0.1 + 0.8 * (i / len(itens)), 0.9)
-                    progress_bar.progress(progress, text=f"Processando pasta {caminho_pasta}...")
-        else:
-            st.warning(f"Erro ao listar arquivos em {caminho_pasta}: {response.status_code}")
-            if response.status_code != 404:  # Ignora erros 404 (pasta não encontrada)
-                st.code(response.text)
-    except Exception as e:
-        st.error(f"Erro ao listar arquivos: {str(e)}")
+    """
+    Lista todos os arquivos em uma biblioteca, incluindo subpastas.
     
-    # Finaliza a barra de progresso
+    As pastas são listadas em paralelo (e em lotes, via $batch) pelo
+    oraculo.scraper, na mesma ordem de um percurso sequencial da árvore.
+    """
+    arquivos = listar_todos_os_arquivos_em_paralelo(
+        token, drive_id, caminho_pasta,
+        progress_bar=progress_bar,
+        limite=limite
+    )
+    
+    # Remove a barra de progresso ao final da busca
     if progress_bar and caminho_pasta == "/":
-        progress_bar.progress(1.0, text="Busca concluída!")
-        time.sleep(0.5)
         progress_bar.empty()
     
     return arquivos
 
 def baixar_arquivo(token, download_url, nome_arquivo, caminho_pasta="/", pasta_destino=DATA_DIR):
-    """Baixa um único arquivo e retorna o caminho local"""
+    """
+    Baixa um único arquivo e retorna o caminho local.
+    
+    O conteúdo é gravado em disco em blocos de 1 MiB, sem ser mantido em
+    memória, em um arquivo temporário que só substitui o destino quando o
+    download termina; a tupla retornada traz None no lugar do conteúdo.
+    """
     headers = {"Authorization": f"Bearer {token}"}
     # Preserva a informação do caminho da pasta no nome do arquivo
-    nome_arquivo_salvo = f"{caminho_pasta.replace('/', '_')}_{nome_arquivo}" if caminho_pasta != "/" else nome_arquivo
-    nome_arquivo_salvo = nome_arquivo_salvo.replace(':', '_').replace('?', '_').replace('*', '_')
+    nome_arquivo_salvo = f"{caminho_pasta}_{nome_arquivo}" if caminho_pasta != "/" else nome_arquivo
+    nome_arquivo_salvo = nome_arquivo_salvo.translate(SANITIZAR_NOME)
     
     caminho_local = os.path.join(pasta_destino, nome_arquivo_salvo)
+    caminho_parcial = f"{caminho_local}.part"
     
     try:
-        response = requests.get(download_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            # Salva o arquivo localmente
-            with open(caminho_local, "wb") as f:
-                f.write(response.content)
-            return caminho_local, response.content, caminho_pasta
-        else:
-            st.warning(f"Erro ao baixar {nome_arquivo}: {response.status_code}")
-            return None, None, None
+        with _SESSION.get(download_url, headers=headers, stream=True, timeout=(10, 300)) as response:
+            if response.status_code == 200:
+                # Salva o arquivo localmente, em blocos (sem arquivos pela metade)
+                with open(caminho_parcial, "wb") as f:
+                    for bloco in response.iter_content(chunk_size=1 << 20):
+                        f.write(bloco)
+                os.replace(caminho_parcial, caminho_local)
+                return caminho_local, None, caminho_pasta
+            else:
+                st.warning(f"Erro ao baixar {nome_arquivo}: {response.status_code}")
+                return None, None, None
     except Exception as e:
+        if os.path.exists(caminho_parcial):
+            os.remove(caminho_parcial)
         st.warning(f"Erro ao baixar {nome_arquivo}: {str(e)}")
         return None, None, None
 
-def pre_processar_imagem(img):
-    """Aplica técnicas de pré-processamento para melhorar a qualidade do OCR"""
-    if not use_preprocessing:
-        return img
-    
-    # Converte para RGB se tiver canal alpha
-    if img.mode == 'RGBA':
-        img = img.convert('RGB')
-    
-    # Aplica as técnicas selecionadas
-    if "Escala de cinza" in preprocessing_options:
-        img = img.convert('L')
-    
-    if "Aumentar contraste" in preprocessing_options:
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(2.0)
-    
-    if "Remover ruído" in preprocessing_options:
-        img = img.filter(ImageFilter.MedianFilter(size=3))
-    
-    if "Nitidez" in preprocessing_options:
-        img = img.filter(ImageFilter.SHARPEN)
-    
-    return img
-
-def extrair_texto_de_imagem(img_data_or_path, nivel_hierarquico=0, caminho_pasta="/"):
-    """Extrai texto de uma imagem usando OCR"""
-    try:
-        # Se for um caminho para arquivo
-        if isinstance(img_data_or_path, str):
-            if not os.path.exists(img_data_or_path):
-                return ""
-            img = Image.open(img_data_or_path)
-            
-            # Extrai o nome do arquivo para análise
-            nome_arquivo = os.path.basename(img_data_or_path)
-        # Se for conteúdo binário
-        elif isinstance(img_data_or_path, bytes):
-            img = Image.open(io.BytesIO(img_data_or_path))
-            nome_arquivo = "arquivo_binario.png"
-        # Se já for um objeto PIL Image
-        elif isinstance(img_data_or_path, Image.Image):
-            img = img_data_or_path
-            nome_arquivo = "imagem.png"
-        else:
-            return ""
-        
-        # Aplica pré-processamento para melhorar a qualidade do OCR
-        img = pre_processar_imagem(img)
-            
-        # Extrai o texto usando pytesseract
-        texto = pytesseract.image_to_string(img, lang=ocr_language)
-        texto_limpo = texto.strip() if texto else "[imagem sem texto legível]"
-        
-        # Adiciona informações de contexto hierárquico
-        if nivel_hierarquico > 0 or caminho_pasta != "/":
-            prefixo = f"[Nível {nivel_hierarquico}]"
-            if caminho_pasta != "/":
-                prefixo += f" [Caminho: {caminho_pasta}]"
-                
-            # Identifica menus e botões baseados no nome do arquivo e conteúdo
-            if "guia" in nome_arquivo.lower() and "pratico" in nome_arquivo.lower():
-                prefixo += " [Menu: Guia Prático]"
-            elif "comunicado" in texto_limpo.lower():
-                prefixo += " [Tipo: Comunicado]"
-                
-            texto_limpo = f"{prefixo}\n{texto_limpo}"
-        
-        return texto_limpo
-    except Exception as e:
-        st.error(f"Erro ao processar imagem com OCR: {str(e)}")
-        return f"[erro ao processar imagem: {str(e)}]"
-
-def extrair_texto_de_pdf_com_pymupdf(pdf_data_or_path, nivel_hierarquico=0, caminho_pasta="/"):
-    """Extrai texto de um PDF usando PyMuPDF (alternativa ao Poppler)"""
-    try:
-        import fitz  # PyMuPDF
-        
-        # Se for um caminho para arquivo
-        if isinstance(pdf_data_or_path, str):
-            if not os.path.exists(pdf_data_or_path):
-                return ""
-            # Extrai o nome do arquivo para análise
-            nome_arquivo = os.path.basename(pdf_data_or_path)
-            doc = fitz.open(pdf_data_or_path)
-        # Se for conteúdo binário
-        elif isinstance(pdf_data_or_path, bytes):
-            nome_arquivo = "arquivo_binario.pdf"
-            doc = fitz.open(stream=pdf_data_or_path, filetype="pdf")
-        else:
-            return ""
-        
-        # Extrai texto de cada página
-        textos = []
-        for i in range(len(doc)):
-            page = doc[i]
-            
-            # Tenta extrair texto diretamente
-            texto = page.get_text()
-            
-            # Se a página tiver texto
-            if texto.strip():
-                textos.append(f"--- Página {i+1} ---\n{texto}")
-            else:
-                # Se não houver texto, extrai como imagem e aplica OCR
-                pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                
-                # Converte para PIL Image
-                img_data = pix.tobytes("ppm")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Aplica OCR na imagem
-                texto_ocr = extrair_texto_de_imagem(img)
-                if texto_ocr and texto_ocr != "[imagem sem texto legível]":
-                    textos.append(f"--- Página {i+1} (OCR) ---\n{texto_ocr}")
-        
-        # Combina o texto de todas as páginas
-        texto_combinado = "\n\n".join(textos) if textos else "[PDF sem texto legível]"
-        
-        # Adiciona informações de contexto hierárquico
-        if nivel_hierarquico > 0 or caminho_pasta != "/":
-            prefixo = f"[Nível {nivel_hierarquico}]"
-            if caminho_pasta != "/":
-                prefixo += f" [Caminho: {caminho_pasta}]"
-                
-            # Identifica tipos de documento baseados no nome
-            if "guia" in nome_arquivo.lower():
-                prefixo += " [Tipo: Guia]"
-            elif "comunicado" in nome_arquivo.lower():
-                prefixo += " [Tipo: Comunicado]"
-                
-            texto_combinado = f"{prefixo}\n{texto_combinado}"
-        
-        return texto_combinado
-    except Exception as e:
-        st.error(f"Erro ao processar PDF com PyMuPDF: {str(e)}")
-        return f"[erro ao processar PDF com PyMuPDF: {str(e)}]"
-
 # NOVA FUNÇÃO: Mapear estrutura completa do SharePoint
 def mapear_estrutura_sharepoint(token: str, site_id: str = SITE_ID, detalhado: bool = True) -> Dict[str, Any]:
     """
@@ -655,7 +529,7 @@ def mapear_estrutura_sharepoint(token: str, site_id: str = SITE_ID, detalhado: b
             
             # Obtém informações de navegação
             nav_url = f"{GRAPH_ROOT}/sites/{site_id}/navigation"
-            response = requests.get(nav_url, headers=headers, timeout=30)
+            response = _SESSION.get(nav_url, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 estrutura_completa["navegacao"] = response.json()
@@ -664,7 +538,7 @@ def mapear_estrutura_sharepoint(token: str, site_id: str = SITE_ID, detalhado: b
             
             # Obtém páginas do site
             pages_url = f"{GRAPH_ROOT}/sites/{site_id}/pages"
-            response = requests.get(pages_url, headers=headers, timeout=30)
+            response = _SESSION.get(pages_url, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 paginas = response.json().get("value", [])
@@ -684,7 +558,7 @@ def mapear_estrutura_sharepoint(token: str, site_id: str = SITE_ID, detalhado: b
                 
             # Obtém listas do site
             lists_url = f"{GRAPH_ROOT}/sites/{site_id}/lists"
-            response = requests.get(lists_url, headers=headers, timeout=30)
+            response = _SESSION.get(lists_url, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 listas = response.json().get("value", [])
@@ -903,8 +777,7 @@ def explorar_estrutura_sharepoint():
             if salvar_resultado:
                 # Cria pasta para resultados se não existir
                 resultado_dir = "resultados_mapeamento"
-                if not os.path.exists(resultado_dir):
-                    os.makedirs(resultado_dir)
+                os.makedirs(resultado_dir, exist_ok=True)
                 
                 # Nome do arquivo com timestamp
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
@@ -1240,8 +1113,7 @@ def acessar_documentos_via_selenium():
                 
                 # Salva os resultados em um arquivo JSON
                 resultado_dir = "resultados_navegacao"
-                if not os.path.exists(resultado_dir):
-                    os.makedirs(resultado_dir)
+                os.makedirs(resultado_dir, exist_ok=True)
                 
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
                 arquivo_json = os.path.join(resultado_dir, f"documentos_sharepoint_{timestamp}.json")
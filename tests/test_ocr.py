@@ -0,0 +1,38 @@
+"""
+Testes de regressão do módulo de OCR.
+"""
+
+import unittest
+
+from PIL import Image, ImageDraw
+
+from oraculo.ocr import detectar_botoes_e_menus
+
+
+def _imagem_com_botao() -> Image.Image:
+    """Imagem branca com um retângulo amarelo (um botão sem texto)."""
+    img = Image.new("RGB", (320, 240), "white")
+    ImageDraw.Draw(img).rectangle((40, 80, 200, 130), fill=(255, 210, 0))
+    return img
+
+
+class DetectarBotoesEMenusTest(unittest.TestCase):
+
+    def test_modos_sem_suporte_a_reduce(self):
+        # Image.reduce falha com "image has wrong mode" nesses modos
+        img = _imagem_com_botao()
+        esperado = detectar_botoes_e_menus(img)
+        for convertida in (
+            img.convert("P", palette=Image.ADAPTIVE),
+            img.convert("1"),
+            img.convert("L").convert("I;16"),
+        ):
+            with self.subTest(modo=convertida.mode):
+                resultado = detectar_botoes_e_menus(convertida)
+                self.assertIsInstance(resultado, list)
+                if convertida.mode == "P":
+                    self.assertEqual(resultado, esperado)
+
+
+if __name__ == "__main__":
+    unittest.main()